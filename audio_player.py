@@ -0,0 +1,250 @@
+"""
+Streaming audio playback.
+Plays MP3 audio while it is still arriving from the network.
+"""
+
+import multiprocessing
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+import miniaudio
+
+# Seconds without samples being pulled (once the download is complete)
+# before playback is treated as stuck
+PLAYBACK_STALL_SECONDS = 5.0
+
+# Playback device buffer; after the decoder finishes this much audio is
+# still queued in the device and must play out before it is closed
+PLAYBACK_BUFFER_MSEC = 200
+
+
+class _ChunkSource(miniaudio.StreamableSource):
+    """Blocking byte source fed with MP3 chunks from another thread"""
+
+    def __init__(self):
+        self.chunks = queue.Queue()
+        self.buffer = b""
+        self.finished = False
+
+    def feed(self, chunk: Optional[bytes]):
+        """Queue a chunk of MP3 data (None marks the end of the stream)"""
+        self.chunks.put(chunk)
+
+    def read(self, num_bytes: int) -> bytes:
+        while len(self.buffer) < num_bytes and not self.finished:
+            chunk = self.chunks.get()
+            if chunk is None:
+                self.finished = True
+                break
+            self.buffer += chunk
+
+        data, self.buffer = self.buffer[:num_bytes], self.buffer[num_bytes:]
+        return data
+
+
+def _guard_stream(stream, on_error, on_progress):
+    """
+    Wrap a primed miniaudio sample generator so failures can't go unnoticed.
+
+    miniaudio pulls samples on its own callback thread, where an exception
+    from the decoder would otherwise be lost along with the end callback.
+    """
+    required_frames = yield b""
+    while True:
+        try:
+            samples = stream.send(required_frames)
+        except StopIteration:
+            return
+        except Exception as e:
+            on_error(e)
+            return
+        on_progress()
+        required_frames = yield samples
+
+
+def play_mp3_stream(chunks: Iterable[bytes], tee_path: Optional[Path] = None,
+                    sample_rate: int = 44100, channels: int = 2) -> int:
+    """
+    Play MP3 audio chunks as they arrive, optionally saving them to disk.
+
+    Chunks are decoded in-process by miniaudio on its playback callback
+    thread, so playback starts with the first chunk and only a frame buffer
+    of PCM is ever held in memory.
+
+    Args:
+        chunks: Iterable of MP3 byte chunks (e.g. an ElevenLabs audio stream)
+        tee_path: Optional path to also write the MP3 bytes to
+        sample_rate: Playback sample rate in Hz
+        channels: Number of playback channels
+
+    Returns:
+        Number of MP3 bytes received
+
+    Raises:
+        Exception: The download or decoder error that ended playback early
+    """
+    source = _ChunkSource()
+    received = 0
+    errors = []
+    finished = threading.Event()
+    last_progress = time.monotonic()
+
+    def fail(error: Exception):
+        errors.append(error)
+        finished.set()
+
+    def progress():
+        nonlocal last_progress
+        last_progress = time.monotonic()
+
+    def download():
+        """Pull chunks from the network, tee them to disk and feed the decoder"""
+        nonlocal received
+        out = None
+        try:
+            if tee_path:
+                path = Path(tee_path)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                out = open(path, 'wb')
+
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                if out:
+                    out.write(chunk)
+                source.feed(chunk)
+                received += len(chunk)
+        except Exception as e:
+            fail(e)
+        finally:
+            if out:
+                out.close()
+            source.feed(None)
+            progress()  # Start the stall window from the end of the download
+
+    download_thread = threading.Thread(target=download, daemon=True)
+    download_thread.start()
+
+    try:
+        stream = miniaudio.stream_any(
+            source,
+            source_format=miniaudio.FileFormat.MP3,
+            output_format=miniaudio.SampleFormat.SIGNED16,
+            nchannels=channels,
+            sample_rate=sample_rate
+        )
+        stream = miniaudio.stream_with_callbacks(stream, end_callback=finished.set)
+        next(stream)  # Prime the generator before handing it to the device
+        stream = _guard_stream(stream, fail, progress)
+        next(stream)
+
+        with miniaudio.PlaybackDevice(
+            output_format=miniaudio.SampleFormat.SIGNED16,
+            nchannels=channels,
+            sample_rate=sample_rate,
+            buffersize_msec=PLAYBACK_BUFFER_MSEC
+        ) as device:
+            device.start(stream)
+
+            # Once every chunk has arrived decoding never blocks on the
+            # network, so a device that stops pulling samples is dead
+            while not finished.wait(timeout=0.5):
+                stalled = time.monotonic() - last_progress > PLAYBACK_STALL_SECONDS
+                if not download_thread.is_alive() and stalled:
+                    fail(RuntimeError("Playback device stopped responding"))
+
+            # The decoder is done but the device buffer isn't; let it drain
+            # so the end of the clip isn't cut off when the device closes
+            if not errors:
+                time.sleep(PLAYBACK_BUFFER_MSEC / 1000)
+    finally:
+        # Always consume the whole input, even if decoding failed
+        download_thread.join()
+
+    if errors:
+        raise errors[0]
+
+    return received
+
+
+def _playback_worker(clips: multiprocessing.Queue):
+    """
+    Worker process loop: play queued clips one after another.
+
+    Queue items are ("chunk", bytes), ("end", None) to close the current clip
+    and ("stop", None) to exit.
+    """
+    while True:
+        kind, data = clips.get()
+        if kind == "stop":
+            break
+        if kind != "chunk":
+            continue
+
+        def clip_chunks(first: bytes = data):
+            yield first
+            while True:
+                kind, chunk = clips.get()
+                if kind != "chunk":
+                    return
+                yield chunk
+
+        try:
+            play_mp3_stream(clip_chunks())
+        except Exception as e:
+            print(f"⚠️  Playback failed: {e}")
+
+
+class PlaybackWorker:
+    """Plays streamed MP3 clips in a separate process so the caller isn't blocked."""
+
+    def __init__(self):
+        self.clips = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=_playback_worker, args=(self.clips,), daemon=True)
+        self.process.start()
+
+    def play_stream(self, chunks: Iterable[bytes], tee_path: Optional[Path] = None) -> int:
+        """
+        Forward MP3 chunks to the worker, optionally saving them to disk.
+
+        Returns once the last chunk has been received; playback continues
+        in the worker process.
+
+        Args:
+            chunks: Iterable of MP3 byte chunks
+            tee_path: Optional path to also write the MP3 bytes to
+
+        Returns:
+            Number of MP3 bytes received
+        """
+        received = 0
+        out = None
+
+        try:
+            if tee_path:
+                tee_path = Path(tee_path)
+                tee_path.parent.mkdir(parents=True, exist_ok=True)
+                out = open(tee_path, 'wb')
+
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                if out:
+                    out.write(chunk)
+                self.clips.put(("chunk", chunk))
+                received += len(chunk)
+        finally:
+            if out:
+                out.close()
+            self.clips.put(("end", None))
+
+        return received
+
+    def close(self):
+        """Stop the worker after any queued clips have finished playing."""
+        if self.process.is_alive():
+            self.clips.put(("stop", None))
+            self.process.join(timeout=30)
@@ -31,24 +31,19 @@ class PodcastController:
             return False
 
         # Initialize Spotify client
+        # Tokens are loaded from and saved to TOKEN_FILE automatically
         self.spotify = SpotifyClient(
             client_id=Config.SPOTIFY_CLIENT_ID,
-            client_secret=Config.SPOTIFY_CLIENT_SECRET
+            client_secret=Config.SPOTIFY_CLIENT_SECRET,
+            token_cache_path=str(Config.TOKEN_FILE)
         )
 
-        # Try to load existing tokens
-        if Config.TOKEN_FILE.exists():
-            print("Loading saved tokens...")
-            self.spotify.load_tokens(str(Config.TOKEN_FILE))
-
-        # Authenticate (will use existing tokens if valid)
+        # Authenticate (will use saved tokens if valid)
         print("Authenticating with Spotify...")
         if not self.spotify.authenticate():
             print("Authentication failed!")
             return False
 
-        # Save tokens for next time
-        self.spotify.save_tokens(str(Config.TOKEN_FILE))
         print("Authentication successful! Tokens saved.")
 
         return True
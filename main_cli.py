@@ -6,7 +6,10 @@ Control Spotify podcast playback with simple commands.
 """
 
 import sys
-from typing import Optional, Dict
+import atexit
+import datetime
+import subprocess
+from typing import Optional, Dict, Callable
 from pathlib import Path
 from spotify_client import SpotifyClient
 from transcriber import SpeechTranscriber
@@ -15,6 +18,7 @@ from rss_manager import RSSManager
 from voice_cloner import VoiceCloner
 from speaker_separator import SpeakerSeparator
 from scribe_diarizer import ScribeDiarizer
+from audio_player import play_mp3_stream, PlaybackWorker
 from pydub import AudioSegment
 from config import Config
 
@@ -22,9 +26,13 @@ from config import Config
 class PodcastController:
     """Main controller that integrates Spotify client with CLI commands."""
 
+    # Episodes larger than this are never fully decoded into memory
+    MAX_DECODE_BYTES = 100 * 1024 * 1024
+
     def __init__(self):
         self.spotify = None
         self.transcriber = SpeechTranscriber()
+        atexit.register(self.transcriber.cleanup)
         self.transcript_manager = TranscriptManager(youtube_api_key=Config.YOUTUBE_API_KEY)
         self.rss_manager = RSSManager()
         self.voice_cloner = VoiceCloner(api_key=Config.ELEVENLABS_API_KEY)
@@ -33,6 +41,25 @@ class PodcastController:
         self.current_voice_ids = {}  # Map speaker_id -> voice_id
         self.current_audio_file = None
         self.speaker_audio_files = {}  # Map speaker_id -> audio_file
+        self.log_file = Path(__file__).parent / "transcriptions.log"
+        self._log_fh = None  # Long-lived, line-buffered log handle
+        self.playback_worker = None  # Background process for voice-transform playback
+        self._last_transcript_key = None  # (video_id, 15s bucket) of the last transcript lookup
+        self._last_transcript_text = None
+
+        # Command verb -> handler(args). A handler returning True exits the CLI.
+        self._commands: Dict[str, Callable[[str], Optional[bool]]] = {
+            'pause': self._cmd_pause, 'p': self._cmd_pause,
+            'resume': self._cmd_resume, 'r': self._cmd_resume, 'play': self._cmd_resume,
+            'status': lambda args: self.show_status(), 's': lambda args: self.show_status(),
+            'talk': lambda args: self.handle_talk(), 't': lambda args: self.handle_talk(),
+            'transcript': lambda args: self.handle_transcript(),
+            'tr': lambda args: self.handle_transcript(),
+            'load': self._cmd_load,
+            'download': self.handle_download,
+            'speak': self._cmd_speak,
+            'quit': self._cmd_quit, 'q': self._cmd_quit, 'exit': self._cmd_quit,
+        }
 
     def setup(self) -> bool:
         """
@@ -47,24 +74,19 @@ class PodcastController:
             return False
 
         # Initialize Spotify client
+        # Tokens are loaded from and saved to TOKEN_FILE automatically
         self.spotify = SpotifyClient(
             client_id=Config.SPOTIFY_CLIENT_ID,
-            client_secret=Config.SPOTIFY_CLIENT_SECRET
+            client_secret=Config.SPOTIFY_CLIENT_SECRET,
+            token_cache_path=str(Config.TOKEN_FILE)
         )
 
-        # Try to load existing tokens
-        if Config.TOKEN_FILE.exists():
-            print("Loading saved tokens...")
-            self.spotify.load_tokens(str(Config.TOKEN_FILE))
-
-        # Authenticate (will use existing tokens if valid)
+        # Authenticate (will use saved tokens if valid)
         print("Authenticating with Spotify...")
         if not self.spotify.authenticate():
             print("Authentication failed!")
             return False
 
-        # Save tokens for next time
-        self.spotify.save_tokens(str(Config.TOKEN_FILE))
         print("Authentication successful! Tokens saved.\n")
 
         return True
@@ -122,6 +144,16 @@ class PodcastController:
 
         if segment_file.exists():
             print(f"✓ 20-minute segment already exists")
+        elif audio_file.stat().st_size > self.MAX_DECODE_BYTES:
+            # Decoding a multi-hour episode with pydub can take gigabytes of
+            # RAM, so stream-copy the first 20 minutes with ffmpeg instead
+            print("Large episode - cutting segment with ffmpeg...")
+            subprocess.run(
+                ["ffmpeg", "-y", "-loglevel", "error", "-i", str(audio_file),
+                 "-t", str(20 * 60), "-c", "copy", str(segment_file)],
+                check=True
+            )
+            print(f"✓ Saved 20-minute segment")
         else:
             print("Loading full audio file...")
             full_audio = AudioSegment.from_mp3(str(audio_file))
@@ -143,7 +175,7 @@ class PodcastController:
             print("✓ Loaded cached Scribe result")
         else:
             print("⚠️  Transcribing with Scribe (cost: ~$0.05)...")
-            scribe_result = self.scribe_diarizer.transcribe_with_diarization(segment_file, num_speakers=2)
+            scribe_result = self.scribe_diarizer.transcribe_in_chunks(segment_file, num_speakers=2)
 
             if not scribe_result:
                 print("\n⚠️  Scribe diarization failed - skipping voice cloning\n")
@@ -343,7 +375,7 @@ class PodcastController:
         turn_count = 0
         first_user_question = None  # Store first question for rewind analysis
         rewind_thread = None  # Background thread for rewind detection
-        rewind_result = {"timestamp": None, "transition": None, "audio_file": None}  # Shared result
+        rewind_result = {"timestamp": None, "transition": None, "audio": None}  # Shared result
 
         print("🎙️  Listening... (will exit if you're silent or when conversation naturally ends)\n")
 
@@ -386,33 +418,25 @@ class PodcastController:
 
                             # Generate transition audio if we have a transition sentence
                             if transition and self.current_voice_ids:
-                                from pathlib import Path
-                                import tempfile
-                                import datetime
+                                import io
                                 import random
 
                                 # Pick a random host voice
                                 speaker_id = random.choice(list(self.current_voice_ids.keys()))
                                 voice_id = self.current_voice_ids[speaker_id]
 
-                                # Generate audio file
-                                temp_dir = Path(tempfile.gettempdir()) / "podchat"
-                                temp_dir.mkdir(exist_ok=True)
-                                timestamp_str = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                                audio_file = temp_dir / f"transition_{timestamp_str}.mp3"
-
-                                # Generate TTS
+                                # Generate TTS into memory
                                 audio_generator = self.voice_cloner.client.text_to_speech.convert(
                                     voice_id=voice_id,
                                     text=transition,
                                     model_id="eleven_turbo_v2_5"
                                 )
 
-                                with open(audio_file, 'wb') as f:
-                                    for chunk in audio_generator:
-                                        f.write(chunk)
+                                audio_buffer = io.BytesIO()
+                                audio_buffer.writelines(audio_generator)
+                                audio_buffer.seek(0)
 
-                                rewind_result["audio_file"] = audio_file
+                                rewind_result["audio"] = audio_buffer
                                 print(f"\n   🎵 Transition audio ready")
 
                         except Exception as e:
@@ -454,7 +478,7 @@ class PodcastController:
                 rewind_thread.join(timeout=10)  # Max 10s wait
 
             # Play transition audio if available
-            if rewind_result.get("audio_file"):
+            if rewind_result.get("audio"):
                 print(f"🎵 Playing transition: \"{rewind_result.get('transition', '')}\"")
                 try:
                     import wave
@@ -463,7 +487,7 @@ class PodcastController:
                     import io
 
                     # Convert MP3 to WAV in memory
-                    audio = AudioSegment.from_mp3(str(rewind_result["audio_file"]))
+                    audio = AudioSegment.from_file(rewind_result["audio"], format="mp3")
                     wav_io = io.BytesIO()
                     audio.export(wav_io, format="wav")
                     wav_io.seek(0)
@@ -520,12 +544,12 @@ class PodcastController:
     def generate_host_response(self, user_text: str, podcast_context: Optional[str] = None, conversation_history: Optional[list] = None):
         """Generate a response from the podcast hosts using their cloned voices with streaming."""
         import anthropic
+        import io
         import os
         import time
         import re
         from queue import Queue
         from threading import Thread
-        import tempfile
 
         print("\n" + "-" * 60)
         print("🎤 PODCAST HOSTS RESPONDING...")
@@ -643,12 +667,24 @@ IMPORTANT: If the listener's message is just an acknowledgment (like "ok", "than
             playback_started = False
             first_audio_time = None
 
+            def synthesize(voice_id: str, sentence: str) -> io.BytesIO:
+                """Generate TTS for a sentence into an in-memory MP3 buffer"""
+                audio_generator = self.voice_cloner.client.text_to_speech.convert(
+                    voice_id=voice_id,
+                    text=sentence,
+                    model_id="eleven_turbo_v2_5",
+                    optimize_streaming_latency=4
+                )
+                audio_buffer = io.BytesIO()
+                audio_buffer.writelines(audio_generator)
+                audio_buffer.seek(0)
+                return audio_buffer
+
             def play_audio_queue():
                 """Play audio chunks with PyAudio for smooth streaming"""
                 import wave
                 import pyaudio
                 from pydub import AudioSegment
-                import io
 
                 # Initialize PyAudio once
                 p = pyaudio.PyAudio()
@@ -659,11 +695,11 @@ IMPORTANT: If the listener's message is just an acknowledgment (like "ok", "than
                         item = audio_queue.get()
                         if item is None:  # Sentinel to stop
                             break
-                        audio_file, sentence = item
+                        audio_buffer, sentence = item
 
                         try:
-                            # Convert MP3 to WAV in memory
-                            audio = AudioSegment.from_mp3(str(audio_file))
+                            # Decode MP3 buffer and convert to WAV in memory
+                            audio = AudioSegment.from_file(audio_buffer, format="mp3")
 
                             # Export to WAV bytes
                             wav_io = io.BytesIO()
@@ -767,31 +803,15 @@ IMPORTANT: If the listener's message is just an acknowledgment (like "ok", "than
                                         if sentence and len(sentence) > 3:
                                             sentence_count += 1
 
-                                            # Generate TTS for this sentence
+                                            # Generate TTS for this sentence with correct voice
                                             tts_start = time.time()
-                                            temp_dir = Path(tempfile.gettempdir()) / "podchat"
-                                            temp_dir.mkdir(exist_ok=True)
-                                            import datetime
-                                            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                                            audio_file = temp_dir / f"stream_{timestamp}_{sentence_count}.mp3"
-
-                                            # Generate audio with correct voice
-                                            audio_generator = self.voice_cloner.client.text_to_speech.convert(
-                                                voice_id=voice_id,
-                                                text=sentence,
-                                                model_id="eleven_turbo_v2_5",
-                                                optimize_streaming_latency=4
-                                            )
-
-                                            with open(audio_file, 'wb') as f:
-                                                for chunk in audio_generator:
-                                                    f.write(chunk)
+                                            audio_buffer = synthesize(voice_id, sentence)
 
                                             tts_time = time.time() - tts_start
                                             tts_times.append(tts_time)
 
                                             # Queue for playback
-                                            audio_queue.put((audio_file, sentence))
+                                            audio_queue.put((audio_buffer, sentence))
 
                                             if not playback_started:
                                                 playback_started = True
@@ -836,29 +856,13 @@ IMPORTANT: If the listener's message is just an acknowledgment (like "ok", "than
 
                                 # Generate TTS for this sentence
                                 tts_start = time.time()
-                                temp_dir = Path(tempfile.gettempdir()) / "podchat"
-                                temp_dir.mkdir(exist_ok=True)
-                                import datetime
-                                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                                audio_file = temp_dir / f"stream_{timestamp}_{sentence_count}.mp3"
-
-                                # Generate audio
-                                audio_generator = self.voice_cloner.client.text_to_speech.convert(
-                                    voice_id=voice_id,
-                                    text=sentence,
-                                    model_id="eleven_turbo_v2_5",
-                                    optimize_streaming_latency=4
-                                )
-
-                                with open(audio_file, 'wb') as f:
-                                    for chunk in audio_generator:
-                                        f.write(chunk)
+                                audio_buffer = synthesize(voice_id, sentence)
 
                                 tts_time = time.time() - tts_start
                                 tts_times.append(tts_time)
 
                                 # Queue for playback
-                                audio_queue.put((audio_file, sentence))
+                                audio_queue.put((audio_buffer, sentence))
 
                                 if not playback_started:
                                     playback_started = True
@@ -880,24 +884,8 @@ IMPORTANT: If the listener's message is just an acknowledgment (like "ok", "than
                 # Process any remaining text (only if not returning)
                 if text_buffer.strip():
                     sentence_count += 1
-                    temp_dir = Path(tempfile.gettempdir()) / "podchat"
-                    temp_dir.mkdir(exist_ok=True)
-                    import datetime
-                    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                    audio_file = temp_dir / f"stream_{timestamp}_{sentence_count}.mp3"
-
-                    audio_generator = self.voice_cloner.client.text_to_speech.convert(
-                        voice_id=voice_id,
-                        text=text_buffer.strip(),
-                        model_id="eleven_turbo_v2_5",
-                        optimize_streaming_latency=4
-                    )
-
-                    with open(audio_file, 'wb') as f:
-                        for chunk in audio_generator:
-                            f.write(chunk)
-
-                    audio_queue.put((audio_file, text_buffer.strip()))
+                    audio_buffer = synthesize(voice_id, text_buffer.strip())
+                    audio_queue.put((audio_buffer, text_buffer.strip()))
 
             # Signal end of playback
             audio_queue.put(None)
@@ -1156,8 +1144,6 @@ TRANSITION: Great question! So as we were saying..."""
 
     def generate_host_echo(self, audio_file: Path):
         """Use voice-to-voice to echo user's words in a host's voice (FAST)."""
-        from pydub import AudioSegment
-        from pydub.playback import play
         import time
         import random
 
@@ -1178,13 +1164,12 @@ TRANSITION: Great question! So as we were saying..."""
             output_dir = Path(__file__).parent / "generated_speech"
             output_dir.mkdir(exist_ok=True)
 
-            import datetime
             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
             output_file = output_dir / f"echo_{timestamp}.mp3"
 
-            # Use speech-to-speech for direct voice transformation
+            # Use streaming speech-to-speech for direct voice transformation
             with open(audio_file, 'rb') as f:
-                audio_generator = self.voice_cloner.client.speech_to_speech.convert(
+                audio_stream = self.voice_cloner.client.speech_to_speech.stream(
                     voice_id=voice_id,
                     audio=f,
                     model_id="eleven_multilingual_sts_v2",  # Speech-to-speech model
@@ -1192,18 +1177,12 @@ TRANSITION: Great question! So as we were saying..."""
                     remove_background_noise=True
                 )
 
-                # Save audio
-                with open(output_file, 'wb') as out:
-                    for chunk in audio_generator:
-                        out.write(chunk)
-
-            transform_time = time.time() - start_time
-            print(f"✓ Voice transformed ({transform_time:.1f}s)")
-
-            # Play the audio
-            print("▶️  Playing...")
-            audio = AudioSegment.from_mp3(str(output_file))
-            play(audio)
+                # Hand chunks to the playback process as they arrive while saving the audio
+                if self.playback_worker is None:
+                    self.playback_worker = PlaybackWorker()
+                    atexit.register(self.playback_worker.close)
+                print("▶️  Playing...")
+                self.playback_worker.play_stream(audio_stream, tee_path=output_file)
 
             total_time = time.time() - start_time
             print(f"✓ Complete (total: {total_time:.1f}s)")
@@ -1250,8 +1229,14 @@ TRANSITION: Great question! So as we were saying..."""
 
         timestamp_seconds = status["progress_ms"] / 1000
 
-        # Get transcript text at this position
-        text = self.transcript_manager.get_text_at_timestamp(timestamp_seconds, context_seconds=30)
+        # Get transcript text at this position, reusing the last lookup within the same 15s bucket
+        key = (self.transcript_manager.current_video_id, int(timestamp_seconds // 15))
+        if key == self._last_transcript_key:
+            text = self._last_transcript_text
+        else:
+            text = self.transcript_manager.get_text_at_timestamp(timestamp_seconds, context_seconds=30)
+            self._last_transcript_key = key
+            self._last_transcript_text = text
 
         if text:
             progress_sec = timestamp_seconds
@@ -1325,7 +1310,7 @@ TRANSITION: Great question! So as we were saying..."""
             actual_text = parts[1]
         else:
             # Use first available speaker
-            speaker_id = list(self.current_voice_ids.keys())[0]
+            speaker_id = next(iter(self.current_voice_ids))
 
         voice_id = self.current_voice_ids[speaker_id]
 
@@ -1335,31 +1320,27 @@ TRANSITION: Great question! So as we were saying..."""
         output_dir = Path(__file__).parent / "generated_speech"
         output_dir.mkdir(exist_ok=True)
 
-        import datetime
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         output_file = output_dir / f"speech_{speaker_id}_{timestamp}.mp3"
 
-        # Generate speech
-        result = self.voice_cloner.generate_speech(
-            text=actual_text,
-            voice_id=voice_id,
-            output_path=output_file
-        )
+        # Stream speech to the speakers while saving it to disk
+        try:
+            audio_stream = self.voice_cloner.stream_speech(text=actual_text, voice_id=voice_id)
+            if audio_stream is None:
+                print(f"\n✗ Speech generation failed\n")
+                return
+
+            print("▶️  Playing...")
+            play_mp3_stream(audio_stream, tee_path=output_file)
 
-        if result:
             print(f"\n✓ Speech generated successfully!")
             print(f"  Speaker: {speaker_id}")
-            print(f"  Play with: open \"{result}\"\n")
-        else:
-            print(f"\n✗ Speech generation failed\n")
+            print(f"  Saved to: {output_file}\n")
+        except Exception as e:
+            print(f"\n✗ Speech generation failed: {e}\n")
 
     def save_transcription_log(self, text: str, podcast_context: dict, podcast_transcript: Optional[str] = None):
         """Save transcription with podcast context to a log file."""
-        import datetime
-        from pathlib import Path
-
-        log_file = Path(__file__).parent / "transcriptions.log"
-
         timestamp_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         log_entry = f"""
@@ -1376,12 +1357,60 @@ Timestamp: {podcast_context['timestamp']} / {podcast_context['total_time']}
         log_entry += f"{'=' * 60}\n"
 
         try:
-            with open(log_file, "a", encoding="utf-8") as f:
-                f.write(log_entry)
-            print(f"💾 Saved to {log_file.name}")
+            if self._log_fh is None:
+                self._log_fh = open(self.log_file, "a", encoding="utf-8", buffering=1)
+                atexit.register(self._log_fh.close)
+            self._log_fh.write(log_entry)
+            print(f"💾 Saved to {self.log_file.name}")
         except Exception as e:
             print(f"⚠️  Could not save to log: {e}")
 
+    def _cmd_pause(self, args: str = ""):
+        print("Pausing playback...")
+        if self.spotify.pause():
+            print("✓ Paused\n")
+        else:
+            print("✗ Failed to pause\n")
+
+    def _cmd_resume(self, args: str = ""):
+        print("Resuming playback...")
+        if self.spotify.resume():
+            print("✓ Playing\n")
+        else:
+            print("✗ Failed to resume\n")
+
+    def _cmd_load(self, args: str):
+        if not args:
+            print("\n⚠️  Usage: load VIDEO_ID\n")
+            return
+        self.handle_load_transcript(args)
+
+    def _cmd_speak(self, args: str):
+        if not args:
+            print("\n⚠️  Usage: speak [SPEAKER] TEXT\n")
+            return
+        self.handle_speak(args)
+
+    def _cmd_quit(self, args: str = "") -> bool:
+        print("\nGoodbye!")
+        return True
+
+    def _enable_completion(self):
+        """Enable tab completion and history for command verbs, if readline is available."""
+        try:
+            import readline
+        except ImportError:
+            return
+
+        verbs = sorted(self._commands)
+
+        def complete(text, state):
+            matches = [verb for verb in verbs if verb.startswith(text)]
+            return matches[state] if state < len(matches) else None
+
+        readline.set_completer(complete)
+        readline.parse_and_bind('tab: complete')
+
     def run(self):
         """Run the interactive CLI."""
         print("""
@@ -1413,55 +1442,24 @@ Commands:
         # Setup voice cloning (download audio + create clone)
         self.setup_voice_clone()
 
+        self._enable_completion()
+
         while True:
             try:
                 command = input(">> ").strip().lower()
-
-                if command in ['pause', 'p']:
-                    print("Pausing playback...")
-                    if self.spotify.pause():
-                        print("✓ Paused\n")
-                    else:
-                        print("✗ Failed to pause\n")
-
-                elif command in ['resume', 'r', 'play']:
-                    print("Resuming playback...")
-                    if self.spotify.resume():
-                        print("✓ Playing\n")
-                    else:
-                        print("✗ Failed to resume\n")
-
-                elif command in ['status', 's']:
-                    self.show_status()
-
-                elif command in ['talk', 't']:
-                    self.handle_talk()
-
-                elif command in ['transcript', 'tr']:
-                    self.handle_transcript()
-
-                elif command.startswith('load '):
-                    video_id = command.split(' ', 1)[1].strip()
-                    self.handle_load_transcript(video_id)
-
-                elif command == 'download' or command.startswith('download '):
-                    args = command[8:].strip() if len(command) > 8 else ""
-                    self.handle_download(args)
-
-                elif command.startswith('speak '):
-                    text = command[6:].strip()
-                    self.handle_speak(text)
-
-                elif command in ['quit', 'q', 'exit']:
-                    print("\nGoodbye!")
-                    break
-
-                elif command == '':
+                if not command:
                     continue
 
-                else:
+                verb, _, args = command.partition(' ')
+                handler = self._commands.get(verb)
+
+                if handler is None:
                     print(f"Unknown command: '{command}'")
                     print("Try: pause, resume, status, talk, transcript, download, speak, or quit\n")
+                    continue
+
+                if handler(args.strip()):
+                    break
 
             except KeyboardInterrupt:
                 print("\n\nGoodbye!")
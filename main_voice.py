@@ -6,7 +6,7 @@ Automatically pauses Spotify when you speak, resumes when you stop.
 """
 
 import sys
-import time
+import threading
 from spotify_client import SpotifyClient
 from voice_detector import VoiceActivityDetector
 from config import Config
@@ -19,6 +19,7 @@ class VoiceActivatedController:
         self.spotify = None
         self.voice_detector = None
         self.was_playing_before_speech = False
+        self._stop = threading.Event()
 
     def setup(self) -> bool:
         """
@@ -33,24 +34,19 @@ class VoiceActivatedController:
             return False
 
         # Initialize Spotify client
+        # Tokens are loaded from and saved to TOKEN_FILE automatically
         self.spotify = SpotifyClient(
             client_id=Config.SPOTIFY_CLIENT_ID,
-            client_secret=Config.SPOTIFY_CLIENT_SECRET
+            client_secret=Config.SPOTIFY_CLIENT_SECRET,
+            token_cache_path=str(Config.TOKEN_FILE)
         )
 
-        # Try to load existing tokens
-        if Config.TOKEN_FILE.exists():
-            print("Loading saved tokens...")
-            self.spotify.load_tokens(str(Config.TOKEN_FILE))
-
-        # Authenticate (will use existing tokens if valid)
+        # Authenticate (will use saved tokens if valid)
         print("Authenticating with Spotify...")
         if not self.spotify.authenticate():
             print("Authentication failed!")
             return False
 
-        # Save tokens for next time
-        self.spotify.save_tokens(str(Config.TOKEN_FILE))
         print("Authentication successful!\n")
 
         return True
@@ -127,11 +123,11 @@ Settings:
 
             print("Ready! Start playing something on Spotify and try speaking.\n")
 
-            # Keep running
-            while True:
-                time.sleep(1)
+            # Block until interrupted
+            self._stop.wait()
 
         except KeyboardInterrupt:
+            self._stop.set()
             print("\n\nStopping...")
         finally:
             if self.voice_detector:
@@ -5,10 +5,17 @@ Handles parsing RSS feeds and downloading podcast audio files.
 
 import feedparser
 import requests
-from typing import Optional, Dict, Any, List
+from requests.adapters import HTTPAdapter
+from typing import Optional, Dict, Any, List, Iterator
 from pathlib import Path
-from fuzzywuzzy import fuzz
+from rapidfuzz import fuzz, process
+from diskcache import Cache
+from lxml import etree
+from tqdm import tqdm
 import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 
 
 class RSSManager:
@@ -27,6 +34,12 @@ class RSSManager:
         'Huberman Lab': 'https://feeds.megaphone.fm/hubermanlab',
     }
 
+    # Characters stripped from download filenames
+    _UNSAFE_FILENAME_CHARS = re.compile(r'[^\w .\-]')
+
+    # Characters ignored when comparing show names
+    _ALIAS_STRIP = re.compile(r'[^a-z0-9]+')
+
     def __init__(self, download_dir: Optional[Path] = None, custom_feeds_file: Optional[Path] = None):
         """
         Initialize RSS manager.
@@ -38,8 +51,21 @@ class RSSManager:
         self.download_dir = download_dir or Path(__file__).parent / "podcast_audio"
         self.download_dir.mkdir(exist_ok=True)
 
+        # Persistent connection pool shared by feed and audio requests
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=8, pool_maxsize=16))
+        self.session.mount('http://', HTTPAdapter(pool_connections=8, pool_maxsize=16))
+
+        # Parsed feeds keyed by URL, revalidated with ETag / Last-Modified
+        self._feed_cache = Cache(str(self.download_dir / '.feed_cache'))
+
+        # Resolved (show, episode) -> audio URL, so repeat downloads skip the feed
+        self._url_cache = Cache(str(self.download_dir / '.url_cache'))
+
         # Load custom feeds if provided
         self.rss_feeds = dict(self.KNOWN_RSS_FEEDS)
+        self._rss_feeds_lower = [(name.lower(), name, url) for name, url in self.rss_feeds.items()]
+        self._alias_index = {self._normalize_show(name): url for name, url in self.rss_feeds.items()}
         if custom_feeds_file and custom_feeds_file.exists():
             self._load_custom_feeds(custom_feeds_file)
 
@@ -48,11 +74,25 @@ class RSSManager:
         try:
             with open(filepath, 'r') as f:
                 custom_feeds = json.load(f)
-                self.rss_feeds.update(custom_feeds)
+                for show_name, rss_url in custom_feeds.items():
+                    self._set_feed(show_name, rss_url)
                 print(f"Loaded {len(custom_feeds)} custom RSS feeds")
         except Exception as e:
             print(f"Warning: Could not load custom feeds: {e}")
 
+    def _set_feed(self, show_name: str, rss_url: str):
+        """Add or replace a feed, keeping the lowercased lookup list in sync."""
+        if show_name in self.rss_feeds:
+            self._rss_feeds_lower = [item for item in self._rss_feeds_lower if item[1] != show_name]
+        self.rss_feeds[show_name] = rss_url
+        self._rss_feeds_lower.append((show_name.lower(), show_name, rss_url))
+        self._alias_index[self._normalize_show(show_name)] = rss_url
+
+    @classmethod
+    def _normalize_show(cls, show_name: str) -> str:
+        """Normalize a show name to lowercase alphanumerics for alias lookup."""
+        return cls._ALIAS_STRIP.sub('', show_name.lower())
+
     def find_rss_feed(self, show_name: str) -> Optional[str]:
         """
         Find RSS feed URL for a podcast show.
@@ -67,19 +107,22 @@ class RSSManager:
         if show_name in self.rss_feeds:
             return self.rss_feeds[show_name]
 
-        # Try fuzzy match
-        best_match = None
-        best_score = 0
+        # Then ignore case and punctuation ("all in podcast" -> "All-In Podcast")
+        rss_url = self._alias_index.get(self._normalize_show(show_name))
+        if rss_url:
+            return rss_url
 
-        for known_show, rss_url in self.rss_feeds.items():
-            score = fuzz.ratio(show_name.lower(), known_show.lower())
-            if score > best_score:
-                best_score = score
-                best_match = rss_url
+        # Try fuzzy match, only accepting high-confidence candidates
+        match = process.extractOne(
+            show_name.lower(),
+            [known_show_lower for known_show_lower, _, _ in self._rss_feeds_lower],
+            scorer=fuzz.ratio,
+            score_cutoff=80
+        )
 
-        # Return if confidence is high enough
-        if best_score > 80:
-            return best_match
+        if match:
+            _, _, index = match
+            return self._rss_feeds_lower[index][2]
 
         return None
 
@@ -93,18 +136,58 @@ class RSSManager:
         Returns:
             Parsed feed or None
         """
+        # Cache problems must never stop a live parse
+        try:
+            cached = self._feed_cache.get(rss_url)
+        except Exception as e:
+            print(f"⚠️  Ignoring unreadable feed cache entry: {e}")
+            cached = None
+        if not isinstance(cached, dict):  # Missing, or the older tuple format
+            cached = {}
+
         try:
             print(f"Parsing RSS feed: {rss_url}")
-            feed = feedparser.parse(rss_url)
+            feed = feedparser.parse(rss_url, etag=cached.get('etag'), modified=cached.get('modified'))
+
+            # Not modified since the last fetch
+            if feed.get('status') == 304 and cached.get('entries') is not None:
+                print("✓ Feed unchanged, using cached copy")
+                return feedparser.FeedParserDict(
+                    feed=cached['feed'],
+                    entries=cached['entries'],
+                    _titles_lower=cached['titles_lower']
+                )
 
             if feed.bozo:  # Feed has errors
                 print(f"Warning: Feed may have parsing errors")
 
-            return feed
+            if feed.entries:
+                # Lowercased titles are cached with the feed so warm starts skip the scan
+                feed['_titles_lower'] = self._lower_titles(feed)
         except Exception as e:
             print(f"Error parsing feed: {e}")
             return None
 
+        if feed.entries:
+            # Only plain, picklable fields: bozo_exception (e.g. a
+            # SAXParseException) pickles but can't be unpickled
+            try:
+                self._feed_cache.set(
+                    rss_url,
+                    {
+                        'etag': feed.get('etag'),
+                        'modified': feed.get('modified'),
+                        'feed': feed.get('feed', {}),
+                        'entries': feed.entries,
+                        'titles_lower': feed['_titles_lower'],
+                    },
+                    expire=3600
+                )
+            except Exception as e:
+                print(f"⚠️  Could not cache feed: {e}")
+
+        return feed
+
     def find_episode_in_feed(self, feed: feedparser.FeedParserDict,
                             episode_title: str) -> Optional[Dict[str, Any]]:
         """
@@ -120,29 +203,100 @@ class RSSManager:
         if not feed or not feed.entries:
             return None
 
-        best_match = None
-        best_score = 0
-
-        for entry in feed.entries:
-            entry_title = entry.get('title', '')
-            score = fuzz.ratio(episode_title.lower(), entry_title.lower())
-
-            if score > best_score:
-                best_score = score
-                best_match = entry
-
-        # Return if confidence is high enough
-        if best_score > 70:
+        # Feeds from parse_feed already carry their lowercased titles
+        if '_titles_lower' not in feed:
+            feed['_titles_lower'] = self._lower_titles(feed)
+
+        # WRatio handles partial/token matches in long episode titles
+        match = process.extractOne(
+            episode_title.lower(),
+            feed['_titles_lower'],
+            scorer=fuzz.WRatio,
+            score_cutoff=70
+        )
+
+        if match:
+            _, score, index = match
+            best_match = feed.entries[index]
             return {
                 'title': best_match.get('title'),
                 'audio_url': self._get_audio_url(best_match),
                 'published': best_match.get('published'),
                 'description': best_match.get('summary', ''),
-                'match_score': best_score
+                'match_score': round(score)
             }
 
         return None
 
+    def _iter_episodes(self, rss_url: str) -> Iterator[Dict[str, Any]]:
+        """
+        Stream episodes from an RSS feed without building the whole tree.
+
+        Args:
+            rss_url: URL of the RSS feed
+
+        Yields:
+            Dict with title, audio_url, published and description
+        """
+        response = self.session.get(rss_url, stream=True, timeout=30)
+        response.raise_for_status()
+        response.raw.decode_content = True
+
+        try:
+            for _, item in etree.iterparse(response.raw, events=('end',), tag='item'):
+                enclosure = item.find('enclosure')
+                audio_url = None
+                if enclosure is not None and enclosure.get('type', '').startswith('audio/'):
+                    audio_url = enclosure.get('url')
+
+                yield {
+                    'title': item.findtext('title', ''),
+                    'audio_url': audio_url,
+                    'published': item.findtext('pubDate'),
+                    'description': item.findtext('description', '')
+                }
+
+                # Free parsed items to keep memory flat
+                item.clear()
+                while item.getprevious() is not None:
+                    del item.getparent()[0]
+        finally:
+            response.close()
+
+    def find_episode_streaming(self, rss_url: str, episode_title: str) -> Optional[Dict[str, Any]]:
+        """
+        Find an episode by streaming the feed, stopping at a near-exact match.
+
+        Args:
+            rss_url: URL of the RSS feed
+            episode_title: Title of the episode to find
+
+        Returns:
+            Episode info or None
+        """
+        episode_title_lower = episode_title.lower()
+        best_match = None
+        best_score = 0
+
+        for episode in self._iter_episodes(rss_url):
+            score = fuzz.WRatio(episode_title_lower, episode['title'].lower())
+            if score > best_score:
+                best_score = score
+                best_match = episode
+                if score >= 95:
+                    break
+
+        if best_score >= 70:
+            best_match['match_score'] = round(best_score)
+            return best_match
+
+        return None
+
+    @staticmethod
+    def _lower_titles(feed: feedparser.FeedParserDict) -> List[str]:
+        """Lowercased entry titles, index-aligned with feed.entries."""
+        return [entry.get('title', '').lower() for entry in feed.entries]
+
     def _get_audio_url(self, entry) -> Optional[str]:
         """Extract audio URL from RSS entry."""
         # Try enclosures first (most common)
@@ -180,7 +334,7 @@ class RSSManager:
                 filename = audio_url.split('/')[-1].split('?')[0]
 
             # Sanitize filename
-            filename = "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.')).strip()
+            filename = self._UNSAFE_FILENAME_CHARS.sub('', filename).strip()
             if not filename.endswith('.mp3'):
                 filename += '.mp3'
 
@@ -193,30 +347,106 @@ class RSSManager:
 
             # Download
             print(f"Downloading: {audio_url}")
-            response = requests.get(audio_url, stream=True, timeout=30)
-            response.raise_for_status()
-
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
-
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-
-                        # Progress indicator
-                        if total_size > 0:
-                            percent = (downloaded / total_size) * 100
-                            print(f"Progress: {percent:.1f}%", end='\r')
 
-            print(f"\n✓ Downloaded: {filepath}")
+            # Use parallel ranged GETs when the server supports them
+            head = self.session.head(audio_url, allow_redirects=True, timeout=30)
+            total_size = int(head.headers.get('content-length', 0))
+            supports_ranges = head.headers.get('accept-ranges', '').lower() == 'bytes'
+
+            # Write to a .part file so an interrupted download never looks complete
+            part_path = filepath.with_suffix(filepath.suffix + '.part')
+            try:
+                if not (supports_ranges and total_size > 0 and
+                        self._download_ranged(head.url, part_path, total_size)):
+                    self._download_single(audio_url, part_path)
+                part_path.replace(filepath)
+            except BaseException:
+                part_path.unlink(missing_ok=True)
+                raise
+
+            print(f"✓ Downloaded: {filepath}")
             return filepath
 
         except Exception as e:
             print(f"Error downloading episode: {e}")
             return None
 
+    def _download_single(self, audio_url: str, filepath: Path):
+        """Download a file over a single streamed connection."""
+        response = self.session.get(audio_url, stream=True, timeout=30)
+        response.raise_for_status()
+
+        total_size = int(response.headers.get('content-length', 0))
+        downloaded = 0
+
+        with open(filepath, 'wb') as f, \
+                tqdm(total=total_size or None, unit='B', unit_scale=True) as pbar:
+            for chunk in response.iter_content(chunk_size=262144):
+                if chunk:
+                    f.write(chunk)
+                    downloaded += len(chunk)
+                    pbar.update(len(chunk))
+
+        if total_size and downloaded != total_size:
+            raise IOError(f"Incomplete download: got {downloaded} of {total_size} bytes")
+
+    def _download_ranged(self, audio_url: str, filepath: Path, total_size: int,
+                         num_workers: int = 8) -> bool:
+        """
+        Download a file with parallel HTTP Range requests.
+
+        Args:
+            audio_url: URL of the audio file
+            filepath: Destination path
+            total_size: Content-Length of the file
+            num_workers: Number of parallel ranges
+
+        Returns:
+            True on success, False if the server ignored the Range header
+        """
+        part_size = -(-total_size // num_workers)
+        ranges = [(start, min(start + part_size, total_size) - 1)
+                  for start in range(0, total_size, part_size)]
+
+        # Preallocate so each worker can write at its own offset
+        with open(filepath, 'wb') as f:
+            f.truncate(total_size)
+
+        fd = os.open(filepath, os.O_WRONLY)
+        pbar = tqdm(total=total_size, unit='B', unit_scale=True)
+
+        def fetch(byte_range):
+            start, end = byte_range
+            response = self.session.get(audio_url, headers={'Range': f'bytes={start}-{end}'},
+                                        stream=True, timeout=30)
+            response.raise_for_status()
+            if response.status_code != 206:
+                response.close()
+                return False
+
+            offset = start
+            for chunk in response.iter_content(chunk_size=262144):
+                if chunk:
+                    os.pwrite(fd, chunk, offset)
+                    offset += len(chunk)
+                    pbar.update(len(chunk))
+
+            if offset != end + 1:
+                raise IOError(f"Incomplete range {start}-{end}: got {offset - start} bytes")
+            return True
+
+        try:
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                ok = all(executor.map(fetch, ranges))
+        finally:
+            os.close(fd)
+            pbar.close()
+
+        if not ok:
+            print("Server ignored Range requests, falling back to single stream")
+            filepath.unlink(missing_ok=True)
+        return ok
+
     def find_and_download_episode(self, show_name: str, episode_title: str) -> Optional[Path]:
         """
         Find and download a podcast episode.
@@ -228,6 +458,21 @@ class RSSManager:
         Returns:
             Path to downloaded file or None
         """
+        filename = f"{show_name}_{episode_title}.mp3"
+        url_key = (show_name.lower(), episode_title.lower())
+
+        # Skip feed lookup entirely when the audio URL is already known
+        cached_url = self._url_cache.get(url_key)
+        if cached_url:
+            print(f"✓ Using cached audio URL for: {episode_title}")
+            audio_file = self.download_episode(cached_url, filename)
+            if audio_file:
+                return audio_file
+
+            # Dead link (moved CDN, expired signed URL...): look it up again
+            print("⚠️  Cached audio URL failed, looking the episode up in the feed")
+            self._url_cache.delete(url_key)
+
         # Find RSS feed
         rss_url = self.find_rss_feed(show_name)
         if not rss_url:
@@ -237,13 +482,34 @@ class RSSManager:
 
         print(f"Found RSS feed for {show_name}")
 
-        # Parse feed
-        feed = self.parse_feed(rss_url)
-        if not feed:
-            return None
+        feed = None
+        episode = None
+
+        # A feed parsed before is revalidated with ETag/Last-Modified, so an
+        # unchanged feed costs a 304 and reuses its cached titles
+        if rss_url in self._feed_cache:
+            feed = self.parse_feed(rss_url)
+            if feed:
+                episode = self.find_episode_in_feed(feed, episode_title)
+
+        # Otherwise stream the feed and stop at the first near-exact match
+        if feed is None:
+            try:
+                episode = self.find_episode_streaming(rss_url, episode_title)
+            except Exception as e:
+                print(f"Streaming parse failed ({e}), falling back to feedparser")
+                episode = None
+
+            if episode and not episode['audio_url']:
+                episode = None
+
+            if not episode:
+                # Parse feed
+                feed = self.parse_feed(rss_url)
+                if not feed:
+                    return None
+                episode = self.find_episode_in_feed(feed, episode_title)
 
-        # Find episode
-        episode = self.find_episode_in_feed(feed, episode_title)
         if not episode:
             print(f"Could not find episode: {episode_title}")
             print(f"Recent episodes:")
@@ -252,13 +518,15 @@ class RSSManager:
             return None
 
         print(f"Found episode: {episode['title']} (match: {episode['match_score']}%)")
+        if episode['audio_url']:
+            self._url_cache.set(url_key, episode['audio_url'], expire=30 * 24 * 3600)
 
         # Download
-        return self.download_episode(episode['audio_url'], f"{show_name}_{episode_title}.mp3")
+        return self.download_episode(episode['audio_url'], filename)
 
     def add_custom_feed(self, show_name: str, rss_url: str):
         """Add a custom RSS feed to the database."""
-        self.rss_feeds[show_name] = rss_url
+        self._set_feed(show_name, rss_url)
         print(f"Added RSS feed for: {show_name}")
 
 
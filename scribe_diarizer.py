@@ -3,35 +3,106 @@ ElevenLabs Scribe Speaker Diarization
 Uses ElevenLabs Scribe API for accurate speaker diarization from audio files.
 """
 
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from pathlib import Path
 from elevenlabs.client import ElevenLabs
+import numpy as np
+import hashlib
+import io
 import json
+import math
+import subprocess
+import tempfile
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class HashingReader(io.RawIOBase):
+    """
+    Read-only file wrapper that hashes bytes as they are read.
+
+    Seekable like the file it wraps, so HTTP clients can rewind it to retry
+    an upload. Seeking back to the start restarts the hash; seeking anywhere
+    else makes hexdigest() rehash the file from the start.
+    """
+
+    def __init__(self, raw, digest):
+        self.raw = raw
+        self.digest = digest
+        self.name = raw.name
+        self._empty_digest = digest.copy()
+        self._in_order = True
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return self.raw.seekable()
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        position = self.raw.seek(offset, whence)
+        self.digest = self._empty_digest.copy()
+        self._in_order = position == 0
+        return position
+
+    def tell(self) -> int:
+        return self.raw.tell()
+
+    def fileno(self) -> int:
+        return self.raw.fileno()
+
+    def readinto(self, buffer) -> int:
+        n = self.raw.readinto(buffer)
+        if n and self._in_order:
+            self.digest.update(memoryview(buffer)[:n])
+        return n
+
+    def hexdigest(self) -> str:
+        """Hash any unread remainder and return the digest of the whole file."""
+        if not self._in_order:
+            self.seek(0)
+        for _ in iter(lambda: self.read(1 << 20), b''):
+            pass
+        return self.digest.hexdigest()
 
 
 class ScribeDiarizer:
     """Uses ElevenLabs Scribe to transcribe and diarize speakers in audio."""
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, cache_dir: Optional[Path] = None):
         """
         Initialize Scribe diarizer.
 
         Args:
             api_key: ElevenLabs API key
+            cache_dir: Directory for cached Scribe results
         """
         self.api_key = api_key
         if not self.api_key:
             raise ValueError("ElevenLabs API key required for Scribe diarization")
 
         self.client = ElevenLabs(api_key=self.api_key)
+        self.cache_dir = cache_dir or Path(__file__).parent / ".scribe_cache"
 
-    def transcribe_with_diarization(self, audio_file: Path, num_speakers: int = 2) -> Optional[Dict[str, Any]]:
+    def transcribe_with_diarization(self, audio_file: Path, num_speakers: int = 2,
+                                    digest: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         Transcribe audio file with speaker diarization using Scribe.
 
+        Results are cached in cache_dir keyed by a hash of the audio content and
+        num_speakers, so the same audio is never sent to the API twice, even
+        if it was copied, renamed or re-downloaded. Files seen before are
+        looked up by size and mtime; anything else is hashed before the
+        cache is checked. The upload is hashed too, so the result is stored
+        under the content that was actually sent.
+
         Args:
             audio_file: Path to audio file
             num_speakers: Expected number of speakers (default 2 for podcasts)
+            digest: Content hash of audio_file, if the caller already has it
 
         Returns:
             Transcription result with speaker_id for each word, or None on failure
@@ -40,22 +111,44 @@ class ScribeDiarizer:
             print(f"⚠️  Audio file not found: {audio_file}")
             return None
 
+        digest_given = digest is not None
+        digest = digest or self._known_digest(audio_file)
+        if not digest:
+            digest = self._hash_file(audio_file)
+            self._remember_digest(audio_file, digest)
+
+        cached = self.load_scribe_result(self.cache_dir / f"{digest}_{num_speakers}.json")
+        if cached:
+            print(f"✓ Using cached Scribe result for {audio_file.name}")
+            return cached
+
         try:
             print(f"\n🎙️  Transcribing with ElevenLabs Scribe...")
             print(f"   File: {audio_file.name}")
             print(f"   Expected speakers: {num_speakers}")
             print(f"   (This may take a few minutes for long audio files)")
 
-            with open(audio_file, 'rb') as f:
+            with open(audio_file, 'rb', buffering=0) as f:
+                reader = HashingReader(f, hashlib.blake2b(digest_size=16))
+
                 # Call Scribe API with diarization enabled
                 result = self.client.speech_to_text.convert(
-                    file=f,
+                    file=reader,
                     model_id="scribe_v1",
                     diarize=True,
                     num_speakers=num_speakers,
                     timestamps_granularity="word"
                 )
 
+                # The file may have changed since it was hashed; key the
+                # result on what was actually uploaded. Callers that pass a
+                # digest (e.g. for temporary chunk files) track it themselves.
+                uploaded_digest = reader.hexdigest()
+                if uploaded_digest != digest:
+                    digest = uploaded_digest
+                    if not digest_given:
+                        self._remember_digest(audio_file, digest)
+
             print(f"✓ Transcription complete!")
 
             # Convert to dict if needed
@@ -64,12 +157,227 @@ class ScribeDiarizer:
             elif hasattr(result, 'model_dump'):
                 result = result.model_dump()
 
+            self.save_scribe_result(result, self.cache_dir / f"{digest}_{num_speakers}.json")
             return result
 
         except Exception as e:
             print(f"✗ Scribe transcription failed: {e}")
             return None
 
+    def transcribe_in_chunks(self, audio_file: Path, num_speakers: int = 2,
+                             chunk_seconds: int = 300,
+                             overlap_seconds: int = 10) -> Optional[Dict[str, Any]]:
+        """
+        Transcribe audio in fixed-length chunks, caching each chunk's Scribe result.
+
+        Chunks are cut with ffmpeg stream copy and go through the content-hash
+        cache in transcribe_with_diarization, so a failed request or a small
+        change to the source only re-runs the affected chunks. Consecutive
+        chunks overlap so speaker labels can be matched across chunk boundaries.
+
+        Args:
+            audio_file: Path to audio file
+            num_speakers: Expected number of speakers (default 2 for podcasts)
+            chunk_seconds: Length of each chunk in seconds
+            overlap_seconds: Overlap between consecutive chunks in seconds
+
+        Returns:
+            Merged transcription result with the same shape as
+            transcribe_with_diarization, or None on failure
+        """
+        if not audio_file.exists():
+            print(f"⚠️  Audio file not found: {audio_file}")
+            return None
+
+        try:
+            total_seconds = self._probe_duration(audio_file)
+        except (OSError, subprocess.CalledProcessError, ValueError) as e:
+            print(f"✗ Could not read audio duration: {e}")
+            return None
+
+        # The previous chunk's overlap already covers the last overlap_seconds,
+        # so a tail shorter than that (e.g. frame-boundary slack from a stream
+        # copy) doesn't get a near-empty chunk of its own
+        num_chunks = max(1, math.ceil(max(total_seconds - overlap_seconds, 0) / chunk_seconds))
+        print(f"\n✂️  Splitting {audio_file.name} into {num_chunks} chunks of {chunk_seconds // 60} min")
+
+        chunk_results = []
+
+        with tempfile.TemporaryDirectory(prefix="scribe_chunks_") as tmp_dir:
+            for i in range(num_chunks):
+                offset = i * chunk_seconds
+                chunk_file = Path(tmp_dir) / f"chunk_{i:02d}.mp3"
+
+                try:
+                    self._cut_chunk(audio_file, chunk_file, offset, chunk_seconds + overlap_seconds)
+                except (OSError, subprocess.CalledProcessError) as e:
+                    print(f"✗ Could not cut chunk {i}: {e}")
+                    return None
+
+                # Fresh chunk files have no mtime history, so hash them up front
+                # (they were just written and are still in the page cache)
+                print(f"  Chunk {i + 1}/{num_chunks}:")
+                result = self.transcribe_with_diarization(chunk_file, num_speakers=num_speakers,
+                                                          digest=self._hash_file(chunk_file))
+                if not result:
+                    return None
+
+                chunk_results.append((offset, result))
+
+        return self._merge_chunk_results(chunk_results, overlap_seconds)
+
+    def _probe_duration(self, audio_file: Path) -> float:
+        """Return the duration of an audio file in seconds using ffprobe."""
+        output = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", str(audio_file)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        return float(output.strip())
+
+    def _cut_chunk(self, audio_file: Path, chunk_file: Path, start: float, duration: float):
+        """Cut a chunk out of an audio file without re-encoding."""
+        subprocess.run(
+            ["ffmpeg", "-y", "-v", "error", "-ss", str(start), "-t", str(duration),
+             "-i", str(audio_file), "-c", "copy", str(chunk_file)],
+            check=True, capture_output=True
+        )
+
+    def _hash_file(self, path: Path) -> str:
+        """Return the BLAKE2b digest of a file's contents."""
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _digest_key(self, path: Path) -> str:
+        """Identify a file version by path, size and modification time."""
+        stat = path.stat()
+        return f"{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def _known_digest(self, path: Path) -> Optional[str]:
+        """Return the recorded content hash for an unchanged file, if any."""
+        index_file = self.cache_dir / "digests.json"
+        if not index_file.exists():
+            return None
+
+        try:
+            with open(index_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get(self._digest_key(path))
+        except (OSError, ValueError):
+            return None
+
+    def _remember_digest(self, path: Path, digest: str):
+        """Record a file's content hash so later runs can skip re-reading it."""
+        index_file = self.cache_dir / "digests.json"
+        index = {}
+
+        try:
+            if index_file.exists():
+                with open(index_file, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+        index[self._digest_key(path)] = digest
+        index_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(index_file, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+
+    def _speaker_runs(self, words: List[Dict[str, Any]]) -> List[Tuple[float, float, str]]:
+        """Coalesce time-sorted words into (start, end, speaker_id) runs."""
+        runs = []
+        for word in sorted(words, key=lambda w: w.get('start', 0)):
+            speaker_id = word.get('speaker_id')
+            if speaker_id is None:
+                continue
+            start, end = word.get('start', 0), word.get('end', 0)
+            # Overlapping or nearly adjacent words from the same speaker extend the run
+            if runs and runs[-1][2] == speaker_id and start - runs[-1][1] < 0.5:
+                runs[-1] = (runs[-1][0], max(runs[-1][1], end), speaker_id)
+            else:
+                runs.append((start, end, speaker_id))
+        return runs
+
+    def _merge_chunk_results(self, chunk_results: List[Tuple[float, Dict[str, Any]]],
+                             overlap_seconds: float) -> Dict[str, Any]:
+        """
+        Merge per-chunk Scribe results into a single result.
+
+        Word timestamps are shifted by each chunk's offset. Speaker labels of
+        the first chunk become the global labels; labels of later chunks are
+        mapped to the global label they overlap most with inside the shared
+        overlap window, and unmatched labels get a new global label.
+
+        Args:
+            chunk_results: List of (offset_seconds, scribe_result) in chunk order
+            overlap_seconds: Overlap between consecutive chunks in seconds
+
+        Returns:
+            Merged Scribe result
+        """
+        merged_words = []
+        global_labels = set()
+
+        for index, (offset, result) in enumerate(chunk_results):
+            words = []
+            for word in result.get('words', []) or []:
+                shifted = dict(word)
+                shifted['start'] = word.get('start', 0) + offset
+                shifted['end'] = word.get('end', 0) + offset
+                words.append(shifted)
+
+            if index == 0:
+                label_map = {}
+            else:
+                window_start, window_end = offset, offset + overlap_seconds
+                previous_runs = [r for r in self._speaker_runs(merged_words)
+                                 if r[1] > window_start and r[0] < window_end]
+                current_runs = [r for r in self._speaker_runs(words)
+                                if r[1] > window_start and r[0] < window_end]
+
+                scores = {}
+                for c_start, c_end, c_label in current_runs:
+                    for p_start, p_end, p_label in previous_runs:
+                        shared = min(c_end, p_end, window_end) - max(c_start, p_start, window_start)
+                        if shared > 0:
+                            scores[(c_label, p_label)] = scores.get((c_label, p_label), 0) + shared
+
+                label_map = {}
+                used = set()
+                for (c_label, p_label), _ in sorted(scores.items(), key=lambda item: item[1], reverse=True):
+                    if c_label not in label_map and p_label not in used:
+                        label_map[c_label] = p_label
+                        used.add(p_label)
+
+                for label in sorted({w.get('speaker_id') for w in words if w.get('speaker_id') is not None}):
+                    if label not in label_map:
+                        new_label = label
+                        n = len(global_labels)
+                        while new_label in global_labels or new_label in used:
+                            new_label = f"speaker_{n}"
+                            n += 1
+                        label_map[label] = new_label
+                        used.add(new_label)
+
+                # Previous chunk owns the first half of the overlap window, this chunk the rest
+                cut = offset + overlap_seconds / 2
+                merged_words = [w for w in merged_words if w['start'] < cut]
+                words = [w for w in words if w['start'] >= cut]
+
+            for word in words:
+                if word.get('speaker_id') is not None:
+                    word['speaker_id'] = label_map.get(word['speaker_id'], word['speaker_id'])
+                    global_labels.add(word['speaker_id'])
+
+            merged_words.extend(words)
+
+        merged = dict(chunk_results[0][1]) if chunk_results else {}
+        merged['words'] = merged_words
+        merged['text'] = ''.join(w.get('text', '') for w in merged_words)
+        return merged
+
     def parse_speakers_from_scribe(self, scribe_result: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
         """
         Parse Scribe results and group words by speaker.
@@ -89,18 +397,30 @@ class ScribeDiarizer:
             print("⚠️  No word-level data in Scribe result")
             return speakers
 
-        for word_data in words:
-            speaker_id = word_data.get('speaker_id', 'unknown')
-
-            if speaker_id not in speakers:
-                speakers[speaker_id] = []
-
-            speakers[speaker_id].append({
-                'text': word_data.get('text', ''),
-                'start': word_data.get('start', 0),
-                'end': word_data.get('end', 0),
-                'duration': word_data.get('end', 0) - word_data.get('start', 0)
-            })
+        # Load word fields once into contiguous arrays
+        count = len(words)
+        starts = np.fromiter((w.get('start', 0) for w in words), dtype=np.float64, count=count)
+        ends = np.fromiter((w.get('end', 0) for w in words), dtype=np.float64, count=count)
+        durations = ends - starts
+        speaker_ids = np.asarray([w.get('speaker_id') or 'unknown' for w in words])
+
+        # Group word indices by speaker without a per-word dict lookup
+        labels, first_index, inverse = np.unique(speaker_ids, return_index=True, return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(len(labels) + 1))
+
+        # Keep speakers in order of first appearance
+        for label in np.argsort(first_index):
+            indices = order[bounds[label]:bounds[label + 1]].tolist()
+            speakers[str(labels[label])] = [
+                {
+                    'text': words[i].get('text', ''),
+                    'start': starts[i].item(),
+                    'end': ends[i].item(),
+                    'duration': durations[i].item()
+                }
+                for i in indices
+            ]
 
         return speakers
 
@@ -119,24 +439,14 @@ class ScribeDiarizer:
         if not speaker_words:
             return []
 
-        blocks = []
-        current_block = [speaker_words[0]]
-
-        for i in range(1, len(speaker_words)):
-            prev_end = speaker_words[i-1]['end']
-            current_start = speaker_words[i]['start']
-            gap = current_start - prev_end
-
-            if gap <= min_gap_seconds:
-                current_block.append(speaker_words[i])
-            else:
-                blocks.append(current_block)
-                current_block = [speaker_words[i]]
+        count = len(speaker_words)
+        starts = np.fromiter((w['start'] for w in speaker_words), dtype=np.float64, count=count)
+        ends = np.fromiter((w['end'] for w in speaker_words), dtype=np.float64, count=count)
 
-        if current_block:
-            blocks.append(current_block)
+        # Start a new block wherever the gap to the previous word is too large
+        cuts = (np.flatnonzero(starts[1:] - ends[:-1] > min_gap_seconds) + 1).tolist()
 
-        return blocks
+        return [speaker_words[a:b] for a, b in zip([0, *cuts], [*cuts, count])]
 
     def get_speaker_statistics(self, speakers: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
         """
@@ -154,22 +464,24 @@ class ScribeDiarizer:
             if not words:
                 continue
 
-            blocks = self.group_speaker_segments(words, min_gap_seconds=2.0)
+            count = len(words)
+            starts = np.fromiter((w['start'] for w in words), dtype=np.float64, count=count)
+            ends = np.fromiter((w['end'] for w in words), dtype=np.float64, count=count)
+            durations = np.fromiter((w['duration'] for w in words), dtype=np.float64, count=count)
 
-            # Calculate block durations
-            block_durations = []
-            for block in blocks:
-                duration = block[-1]['end'] - block[0]['start']
-                block_durations.append(duration)
+            # Block boundaries use the same 2s gap rule as group_speaker_segments
+            cuts = np.flatnonzero(starts[1:] - ends[:-1] > 2.0) + 1
+            block_starts = starts[np.concatenate(([0], cuts))]
+            block_ends = ends[np.concatenate((cuts - 1, [count - 1]))]
 
-            total_duration = sum(word['duration'] for word in words)
-            longest_block = max(block_durations) if block_durations else 0
+            total_duration = durations.sum().item()
+            longest_block = (block_ends - block_starts).max().item()
 
             stats[speaker_id] = {
-                'words': len(words),
+                'words': count,
                 'total_duration_seconds': total_duration,
                 'total_duration_minutes': total_duration / 60,
-                'num_blocks': len(blocks),
+                'num_blocks': len(block_starts),
                 'longest_block_seconds': longest_block,
                 'longest_block_minutes': longest_block / 60,
                 'first_timestamp': words[0]['start'],
@@ -181,8 +493,12 @@ class ScribeDiarizer:
     def save_scribe_result(self, scribe_result: Dict[str, Any], output_file: Path):
         """Save Scribe result to JSON file for caching."""
         output_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(scribe_result, f, indent=2)
+        if orjson:
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(scribe_result, option=orjson.OPT_INDENT_2))
+        else:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(scribe_result, f, indent=2)
         print(f"💾 Saved Scribe result to: {output_file}")
 
     def load_scribe_result(self, cache_file: Path) -> Optional[Dict[str, Any]]:
@@ -191,6 +507,9 @@ class ScribeDiarizer:
             return None
 
         try:
+            if orjson:
+                with open(cache_file, 'rb') as f:
+                    return orjson.loads(f.read())
             with open(cache_file, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except Exception as e:
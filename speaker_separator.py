@@ -3,10 +3,53 @@ Speaker Separator using transcript markers and audio extraction.
 Uses YouTube transcript >> markers to separate speakers and extract audio chunks.
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from collections import namedtuple
+from operator import attrgetter
 from pathlib import Path
-from pydub import AudioSegment
+import numpy as np
 import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import av
+except ImportError:
+    av = None
+
+
+# Matches a leading ">>" speaker-change marker and captures the remaining text
+_MARK = re.compile(r'^\s*>>\s*(.*?)\s*$', re.DOTALL).match
+
+# Lightweight transcript segment (smaller and faster to access than a dict)
+Segment = namedtuple('Segment', 'text start duration')
+
+
+def _as_segments(segments: List[Any]) -> List[Segment]:
+    """Convert transcript dicts to Segment tuples (lists of Segments pass through)."""
+    if not segments or isinstance(segments[0], Segment):
+        return segments
+    return [Segment(seg['text'], seg['start'], seg['duration']) for seg in segments]
+
+
+def word_count(text: str) -> int:
+    """
+    Count whitespace-separated words without building a list of substrings.
+
+    Single-space separated text (the common case for caption segments) is
+    counted directly; anything with runs of spaces, tabs or newlines falls
+    back to str.split() for an exact count.
+    """
+    text = text.strip()
+    if not text:
+        return 0
+    if '  ' in text or '\n' in text or '\t' in text or '\r' in text:
+        return len(text.split())
+    return text.count(' ') + 1
 
 
 class SpeakerSeparator:
@@ -14,9 +57,12 @@ class SpeakerSeparator:
 
     def __init__(self):
         """Initialize speaker separator."""
-        pass
+        # Last parsed transcript (held by reference so its identity can't be reused)
+        self._parsed_transcript = None
+        self._parsed_length = 0
+        self._parsed_speakers = None
 
-    def parse_speakers_from_transcript(self, transcript: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    def parse_speakers_from_transcript(self, transcript: List[Dict[str, Any]]) -> Dict[str, List[Segment]]:
         """
         Parse transcript and group segments by speaker using >> markers.
 
@@ -26,26 +72,24 @@ class SpeakerSeparator:
         Returns:
             Dictionary mapping speaker IDs to their segments
         """
+        # Same (unchanged) transcript object as last time: reuse the parse
+        if transcript is self._parsed_transcript and len(transcript) == self._parsed_length:
+            return self._parsed_speakers
+
         speakers = {}
         current_speaker = "Speaker_0"
         speaker_count = 0
 
-        for i, segment in enumerate(transcript):
-            text = segment['text'].strip()
-
+        for segment in _as_segments(transcript):
             # Check for speaker change marker
-            if text.startswith('>>'):
+            marker = _MARK(segment.text)
+            if marker is not None:
                 # New speaker
                 speaker_count += 1
                 current_speaker = f"Speaker_{speaker_count % 2}"  # Alternate between 0 and 1
 
                 # Remove >> marker from text
-                text = text[2:].strip()
-                segment = {
-                    'text': text,
-                    'start': segment['start'],
-                    'duration': segment['duration']
-                }
+                segment = segment._replace(text=marker.group(1))
 
             # Add segment to current speaker
             if current_speaker not in speakers:
@@ -53,9 +97,12 @@ class SpeakerSeparator:
 
             speakers[current_speaker].append(segment)
 
+        self._parsed_transcript = transcript
+        self._parsed_length = len(transcript)
+        self._parsed_speakers = speakers
         return speakers
 
-    def get_speaker_statistics(self, speakers: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    def get_speaker_statistics(self, speakers: Dict[str, List[Segment]]) -> Dict[str, Any]:
         """
         Calculate statistics for each speaker.
 
@@ -68,23 +115,24 @@ class SpeakerSeparator:
         stats = {}
 
         for speaker_id, segments in speakers.items():
-            total_duration = sum(seg['duration'] for seg in segments)
+            segments = _as_segments(segments)
+            total_duration = sum(seg.duration for seg in segments)
             total_segments = len(segments)
-            total_words = sum(len(seg['text'].split()) for seg in segments)
+            total_words = sum(word_count(seg.text) for seg in segments)
 
             stats[speaker_id] = {
                 'segments': total_segments,
                 'duration_seconds': total_duration,
                 'duration_minutes': total_duration / 60,
                 'words': total_words,
-                'first_timestamp': segments[0]['start'] if segments else 0,
-                'last_timestamp': segments[-1]['start'] if segments else 0
+                'first_timestamp': segments[0].start if segments else 0,
+                'last_timestamp': segments[-1].start if segments else 0
             }
 
         return stats
 
-    def group_continuous_segments(self, segments: List[Dict[str, Any]],
-                                 max_gap_seconds: float = 5.0) -> List[List[Dict[str, Any]]]:
+    def group_continuous_segments(self, segments: List[Segment],
+                                 max_gap_seconds: float = 5.0) -> List[List[Segment]]:
         """
         Group segments into continuous blocks where the speaker doesn't get interrupted.
         A block ends when there's a significant time gap (other speaker talking).
@@ -99,31 +147,18 @@ class SpeakerSeparator:
         if not segments:
             return []
 
-        groups = []
-        current_group = [segments[0]]
+        segments = _as_segments(segments)
+        count = len(segments)
+        starts = np.fromiter((seg.start for seg in segments), dtype=np.float64, count=count)
+        ends = starts + np.fromiter((seg.duration for seg in segments), dtype=np.float64, count=count)
 
-        for i in range(1, len(segments)):
-            prev_end = segments[i-1]['start'] + segments[i-1]['duration']
-            current_start = segments[i]['start']
-            gap = current_start - prev_end
+        # A large gap means the other speaker was talking, so start a new block there
+        cuts = (np.flatnonzero(starts[1:] - ends[:-1] > max_gap_seconds) + 1).tolist()
 
-            # If gap is small (< 5 seconds), continue same block
-            # If gap is large, it means the other speaker was talking
-            if gap <= max_gap_seconds:
-                current_group.append(segments[i])
-            else:
-                # Save current group and start new one
-                groups.append(current_group)
-                current_group = [segments[i]]
+        return [segments[a:b] for a, b in zip([0, *cuts], [*cuts, count])]
 
-        # Add last group
-        if current_group:
-            groups.append(current_group)
-
-        return groups
-
-    def prioritize_segments_for_voice_cloning(self, segments: List[Dict[str, Any]],
-                                             max_duration_minutes: float) -> List[Dict[str, Any]]:
+    def prioritize_segments_for_voice_cloning(self, segments: List[Segment],
+                                             max_duration_minutes: float) -> List[Segment]:
         """
         Select best segments for voice cloning by prioritizing longer continuous blocks.
 
@@ -141,16 +176,31 @@ class SpeakerSeparator:
         group_info = []
         for group in groups:
             # Use actual time span instead of summing durations (which may overlap)
-            actual_duration = (group[-1]['start'] + group[-1]['duration']) - group[0]['start']
+            actual_duration = (group[-1].start + group[-1].duration) - group[0].start
             group_info.append({
                 'segments': group,
                 'duration': actual_duration,
-                'start': group[0]['start'],
-                'word_count': sum(len(seg['text'].split()) for seg in group)
+                'start': group[0].start,
+                'word_count': sum(word_count(seg.text) for seg in group)
             })
 
-        # Sort by duration (longest first)
-        group_info.sort(key=lambda x: x['duration'], reverse=True)
+        # Rank by duration (longest first). Only the first few blocks are
+        # normally consumed, so partially select the top K instead of sorting all
+        durations = -np.array([info['duration'] for info in group_info])
+        k = max(8, int(max_duration_minutes))
+        if len(group_info) > k:
+            top = np.argpartition(durations, k)[:k]
+            top = top[np.argsort(durations[top], kind='stable')]
+        else:
+            top = np.argsort(durations, kind='stable')
+
+        def ranked_groups():
+            yield from (group_info[i] for i in top.tolist())
+            if len(group_info) > k:
+                # Budget not reached within the top K: rank the remainder too
+                rest = np.setdiff1d(np.arange(len(group_info)), top)
+                rest = rest[np.argsort(durations[rest], kind='stable')]
+                yield from (group_info[i] for i in rest.tolist())
 
         # Select groups until we hit the duration limit
         max_duration_seconds = max_duration_minutes * 60
@@ -160,12 +210,12 @@ class SpeakerSeparator:
         print(f"\n  Found {len(group_info)} continuous speech blocks")
         print(f"  Top 5 longest blocks:")
 
-        for i, info in enumerate(group_info[:5]):
+        for i, info in enumerate(group_info[j] for j in top[:5].tolist()):
             print(f"    {i+1}. {info['duration']/60:.1f} min ({info['word_count']} words) at {info['start']/60:.1f} min")
 
         print(f"\n  Selecting longest blocks up to {max_duration_minutes} min...")
 
-        for info in group_info:
+        for info in ranked_groups():
             # Check if adding this block would exceed the limit
             if total_duration + info['duration'] > max_duration_seconds:
                 # If we haven't added any blocks yet, add this one even if it exceeds
@@ -183,12 +233,82 @@ class SpeakerSeparator:
             print(f"    ✓ Added {info['duration']/60:.1f} min block (total: {total_duration/60:.1f} min)")
 
         # Sort selected segments by timestamp to maintain order
-        selected_segments.sort(key=lambda x: x['start'])
+        selected_segments.sort(key=attrgetter('start'))
 
         return selected_segments
 
-    def extract_speaker_audio(self, audio_file: Path, segments: List[Dict[str, Any]],
-                             output_file: Path, max_duration_minutes: Optional[int] = None) -> Optional[Path]:
+    def merge_segment_ranges(self, segments: List[Segment],
+                             epsilon_seconds: float = 0.05) -> List[Tuple[float, float]]:
+        """
+        Merge overlapping or touching segments into contiguous time ranges.
+
+        Args:
+            segments: Segments with 'start' and 'duration'
+            epsilon_seconds: Gaps up to this size are merged
+
+        Returns:
+            Sorted list of (start, end) ranges in seconds
+        """
+        ranges = []
+
+        for segment in sorted(_as_segments(segments), key=attrgetter('start')):
+            start = segment.start
+            end = start + segment.duration
+
+            if ranges and start <= ranges[-1][1] + epsilon_seconds:
+                ranges[-1] = (ranges[-1][0], max(ranges[-1][1], end))
+            else:
+                ranges.append((start, end))
+
+        return ranges
+
+    def decode_to_pcm(self, audio_file: Path, pcm_file: Path, sample_rate: int = 44100) -> np.ndarray:
+        """
+        Decode an audio file once to raw mono 16-bit PCM and memory-map it.
+
+        Args:
+            audio_file: Path to source audio file
+            pcm_file: Path to write the raw PCM to
+            sample_rate: Output sample rate in Hz
+
+        Returns:
+            Read-only int16 memmap over the decoded samples
+
+        Raises:
+            subprocess.CalledProcessError: If ffmpeg fails
+            ValueError: If the source decodes to no audio
+        """
+        subprocess.run(
+            ["ffmpeg", "-y", "-v", "error", "-i", str(audio_file),
+             "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), str(pcm_file)],
+            check=True,
+            capture_output=True
+        )
+        if pcm_file.stat().st_size < 2:  # np.memmap can't map an empty file
+            raise ValueError(f"{audio_file.name} decoded to no audio samples")
+        return np.memmap(pcm_file, dtype=np.int16, mode='r')
+
+    def _extract_from_pcm(self, pcm: np.ndarray, ranges: List[Tuple[float, float]],
+                          output_file: Path, sample_rate: int):
+        """Gather ranges from decoded PCM with zero-copy slices and encode once."""
+        combined = np.concatenate([pcm[int(start * sample_rate):int(end * sample_rate)]
+                                   for start, end in ranges])
+
+        # Pipe the PCM straight into the encoder (no intermediate WAV file)
+        encoder = subprocess.Popen(
+            ["ffmpeg", "-y", "-v", "error", "-f", "s16le", "-ar", str(sample_rate), "-ac", "1",
+             "-i", "pipe:0", "-c:a", "libmp3lame", "-b:a", "192k",  # Higher bitrate for better quality
+             "-f", "mp3", str(output_file)],
+            stdin=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        _, stderr = encoder.communicate(memoryview(np.ascontiguousarray(combined)).cast('B'))
+        if encoder.returncode != 0:
+            raise RuntimeError(stderr.decode(errors='replace').strip())
+
+    def extract_speaker_audio(self, audio_file: Path, segments: List[Segment],
+                             output_file: Path, max_duration_minutes: Optional[int] = None,
+                             pcm: Optional[np.ndarray] = None, sample_rate: int = 44100) -> Optional[Path]:
         """
         Extract audio chunks for a specific speaker and combine them.
         Prioritizes longer continuous segments for better voice cloning quality.
@@ -198,6 +318,8 @@ class SpeakerSeparator:
             segments: List of segments for this speaker
             output_file: Path to save extracted audio
             max_duration_minutes: Maximum duration to extract (for faster processing)
+            pcm: Optional already-decoded mono int16 samples of audio_file (see decode_to_pcm)
+            sample_rate: Sample rate of pcm
 
         Returns:
             Path to extracted audio file or None
@@ -215,35 +337,23 @@ class SpeakerSeparator:
             if max_duration_minutes:
                 segments = self.prioritize_segments_for_voice_cloning(segments, max_duration_minutes)
 
-            print(f"\n📂 Loading audio file: {audio_file}")
-            audio = AudioSegment.from_mp3(str(audio_file))
-
             print(f"🔪 Extracting {len(segments)} prioritized segments...")
 
-            combined = AudioSegment.empty()
-            total_extracted = 0
-
-            for i, segment in enumerate(segments):
-                start_ms = int(segment['start'] * 1000)
-                duration_ms = int(segment['duration'] * 1000)
-                end_ms = start_ms + duration_ms
+            ranges = self.merge_segment_ranges(segments)
+            total_extracted = sum(end - start for start, end in ranges)
 
-                # Extract chunk
-                chunk = audio[start_ms:end_ms]
-                combined += chunk
-
-                total_extracted += segment['duration']
-
-                # Progress indicator
-                if (i + 1) % 100 == 0:
-                    print(f"  Processed {i + 1}/{len(segments)} segments ({total_extracted/60:.1f} min)")
+            print(f"  Merged into {len(ranges)} contiguous ranges")
 
             # Create output directory
             output_file.parent.mkdir(parents=True, exist_ok=True)
 
-            # Export
             print(f"💾 Saving to: {output_file}")
-            combined.export(str(output_file), format="mp3", bitrate="192k")  # Higher bitrate for better quality
+            if pcm is not None:
+                self._extract_from_pcm(pcm, ranges, output_file, sample_rate)
+            elif shutil.which("ffmpeg"):
+                self._extract_with_ffmpeg(audio_file, ranges, output_file)
+            else:
+                self._extract_with_av(audio_file, ranges, output_file)
 
             print(f"✓ Extracted {total_extracted/60:.1f} minutes of audio")
             return output_file
@@ -252,6 +362,82 @@ class SpeakerSeparator:
             print(f"✗ Failed to extract audio: {e}")
             return None
 
+    def _extract_with_ffmpeg(self, audio_file: Path, ranges: List[Tuple[float, float]], output_file: Path):
+        """Trim and join ranges in a single ffmpeg concat-demuxer pass."""
+        source = str(audio_file.resolve()).replace("'", "'\\''")
+        lines = [f"file '{source}'\ninpoint {start:.3f}\noutpoint {end:.3f}\n" for start, end in ranges]
+
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write(''.join(lines))
+            concat_list = f.name
+
+        try:
+            subprocess.run(
+                ["ffmpeg", "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", concat_list,
+                 "-c:a", "libmp3lame", "-b:a", "192k",  # Higher bitrate for better quality
+                 str(output_file)],
+                check=True,
+                capture_output=True
+            )
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(e.stderr.decode(errors='replace').strip()) from e
+        finally:
+            os.unlink(concat_list)
+
+    def _decode_range_av(self, audio_file: Path, start: float, end: float) -> np.ndarray:
+        """Decode one time range to interleaved int16 PCM with PyAV."""
+        with av.open(str(audio_file)) as container:
+            stream = container.streams.audio[0]
+            layout = stream.codec_context.layout
+            channels = len(layout.channels)
+            rate = stream.codec_context.sample_rate
+            resampler = av.AudioResampler(format='s16', layout=layout.name, rate=rate)
+
+            container.seek(int(start / stream.time_base), stream=stream)
+            pieces = []
+
+            for frame in container.decode(stream):
+                frame_start = float(frame.pts * stream.time_base)
+                if frame_start >= end:
+                    break
+
+                for out in resampler.resample(frame):
+                    pcm = out.to_ndarray().reshape(-1, channels)
+                    # Trim samples outside [start, end)
+                    first = max(0, int(round((start - frame_start) * rate)))
+                    last = min(len(pcm), int(round((end - frame_start) * rate)))
+                    if last > first:
+                        pieces.append(pcm[first:last])
+
+            return np.concatenate(pieces) if pieces else np.zeros((0, channels), dtype=np.int16)
+
+    def _extract_with_av(self, audio_file: Path, ranges: List[Tuple[float, float]], output_file: Path):
+        """Decode ranges in parallel with PyAV and encode them in one pass (no ffmpeg binary needed)."""
+        if av is None:
+            raise RuntimeError("ffmpeg not found and PyAV is not installed")
+
+        # libav releases the GIL while decoding, so threads decode ranges concurrently
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            pieces = list(executor.map(lambda r: self._decode_range_av(audio_file, *r), ranges))
+
+        pcm = np.concatenate(pieces)
+
+        with av.open(str(audio_file)) as container:
+            source = container.streams.audio[0].codec_context
+            layout, rate = source.layout.name, source.sample_rate
+
+        with av.open(str(output_file), 'w') as output:
+            stream = output.add_stream('libmp3lame', rate=rate, layout=layout)
+            stream.bit_rate = 192000
+
+            frame = av.AudioFrame.from_ndarray(pcm.reshape(1, -1), format='s16', layout=layout)
+            frame.sample_rate = rate
+
+            for packet in stream.encode(frame):
+                output.mux(packet)
+            for packet in stream.encode(None):
+                output.mux(packet)
+
     def separate_speakers(self, transcript: List[Dict[str, Any]], audio_file: Path,
                          output_dir: Path, max_duration_minutes: int = 3) -> Dict[str, Path]:
         """
@@ -292,19 +478,33 @@ class SpeakerSeparator:
         output_dir.mkdir(parents=True, exist_ok=True)
         speaker_audio_files = {}
 
-        for speaker_id, segments in speakers.items():
-            output_file = output_dir / f"{speaker_id}.mp3"
-
-            print(f"\n  Extracting {speaker_id}...")
-            result = self.extract_speaker_audio(
-                audio_file=audio_file,
-                segments=segments,
-                output_file=output_file,
-                max_duration_minutes=max_duration_minutes
-            )
-
-            if result:
-                speaker_audio_files[speaker_id] = result
+        with tempfile.TemporaryDirectory(prefix="speaker_pcm_") as tmp_dir:
+            # Decode the episode once and slice every speaker out of the same PCM
+            pcm = None
+            if shutil.which("ffmpeg"):
+                try:
+                    pcm = self.decode_to_pcm(audio_file, Path(tmp_dir) / "source.pcm")
+                except (subprocess.CalledProcessError, ValueError) as e:
+                    # extract_speaker_audio falls back to per-range ffmpeg cuts
+                    print(f"⚠️  Could not decode audio up front: {e}")
+
+            for speaker_id, segments in speakers.items():
+                output_file = output_dir / f"{speaker_id}.mp3"
+
+                print(f"\n  Extracting {speaker_id}...")
+                result = self.extract_speaker_audio(
+                    audio_file=audio_file,
+                    segments=segments,
+                    output_file=output_file,
+                    max_duration_minutes=max_duration_minutes,
+                    pcm=pcm
+                )
+
+                if result:
+                    speaker_audio_files[speaker_id] = result
+
+            # Release the mapping before the temp directory is removed
+            del pcm
 
         print("\n" + "=" * 60)
         print(f"✓ Separation complete! Extracted {len(speaker_audio_files)} speaker audio files")
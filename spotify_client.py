@@ -4,14 +4,26 @@ Handles authentication and playback control methods.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+import hashlib
 import json
+import logging
+import os
+import random
 import time
 from typing import Optional, Dict, Any
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlsplit, parse_qs
 import webbrowser
 from http.server import BaseHTTPRequestHandler, HTTPServer
 import threading
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
 
 class SpotifyClient:
     """Client for interacting with Spotify Web API to control podcast playback."""
@@ -21,9 +33,11 @@ class SpotifyClient:
     API_BASE_URL = "https://api.spotify.com/v1"
     REDIRECT_URI = "http://127.0.0.1:8889/callback"
     SCOPES = "user-modify-playback-state user-read-playback-state user-read-currently-playing"
+    RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+    MAX_RETRY_AFTER = 30  # Longest Retry-After (seconds) worth blocking the CLI for
 
     def __init__(self, client_id: str, client_secret: str, access_token: Optional[str] = None,
-                 refresh_token: Optional[str] = None):
+                 refresh_token: Optional[str] = None, token_cache_path: Optional[str] = None):
         """
         Initialize Spotify client.
 
@@ -32,12 +46,45 @@ class SpotifyClient:
             client_secret: Spotify app client secret
             access_token: Optional existing access token
             refresh_token: Optional existing refresh token
+            token_cache_path: Optional file to load tokens from and save them to on every update
         """
         self.client_id = client_id
         self.client_secret = client_secret
+        self._auth_header = None
         self.access_token = access_token
         self.refresh_token = refresh_token
         self.token_expiry = 0
+        self.token_cache_path = token_cache_path
+
+        # Everything in the authorize URL is fixed, so build it once
+        self._auth_url = f"{self.AUTH_URL}?" + urlencode({
+            "client_id": client_id,
+            "response_type": "code",
+            "redirect_uri": self.REDIRECT_URI,
+            "scope": self.SCOPES
+        })
+
+        # Persistent keep-alive session so TLS handshakes are reused across calls
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+        # Short-lived playback caches to coalesce back-to-back polls
+        self._playback_cache = None
+        self._playback_cache_ts = 0.0
+        self._playback_fingerprint = None
+        self._playback_parsed = None
+        self._status_cache = None
+        self._status_ts = 0.0
+
+    @property
+    def access_token(self) -> Optional[str]:
+        return self._access_token
+
+    @access_token.setter
+    def access_token(self, token: Optional[str]):
+        # Build the bearer header once per token instead of once per request
+        self._access_token = token
+        self._auth_header = f"Bearer {token}" if token else None
 
     def authenticate(self) -> bool:
         """
@@ -47,6 +94,11 @@ class SpotifyClient:
         Returns:
             True if authentication successful, False otherwise
         """
+        # Reuse tokens persisted by a previous run
+        if self.token_cache_path and self.access_token is None:
+            if self.load_tokens(self.token_cache_path):
+                print("Loaded saved tokens")
+
         # If we have a valid token, no need to re-authenticate
         if self.access_token and time.time() < self.token_expiry:
             return True
@@ -57,14 +109,7 @@ class SpotifyClient:
                 return True
 
         # Otherwise, start new OAuth flow
-        auth_params = {
-            "client_id": self.client_id,
-            "response_type": "code",
-            "redirect_uri": self.REDIRECT_URI,
-            "scope": self.SCOPES
-        }
-
-        auth_url = f"{self.AUTH_URL}?{urlencode(auth_params)}"
+        auth_url = self._auth_url
         print(f"Opening browser for authentication...")
         print(f"If browser doesn't open, visit: {auth_url}")
         webbrowser.open(auth_url)
@@ -82,13 +127,15 @@ class SpotifyClient:
     def _wait_for_callback(self) -> Optional[str]:
         """Start a local server to receive the OAuth callback."""
         auth_code = [None]  # Use list to allow modification in nested function
+        done = threading.Event()
 
         class CallbackHandler(BaseHTTPRequestHandler):
             def do_GET(self):
                 # Extract code from query parameters
-                if "code=" in self.path:
-                    code = self.path.split("code=")[1].split("&")[0]
-                    auth_code[0] = code
+                query = parse_qs(urlsplit(self.path).query)
+                if "code" in query:
+                    auth_code[0] = query["code"][0]
+                    done.set()
 
                     # Send response to browser
                     self.send_response(200)
@@ -104,14 +151,16 @@ class SpotifyClient:
             def log_message(self, format, *args):
                 pass  # Suppress server logs
 
+        # HTTPServer sets SO_REUSEADDR, so a retry can rebind the port immediately
         server = HTTPServer(("127.0.0.1", 8889), CallbackHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
 
-        # Wait for callback (with timeout)
-        timeout = 120  # 2 minutes
-        start_time = time.time()
-
-        while auth_code[0] is None and (time.time() - start_time) < timeout:
-            server.handle_request()
+        # Block until the handler receives the code (with timeout)
+        try:
+            done.wait(timeout=120)  # 2 minutes
+        finally:
+            server.shutdown()
+            server.server_close()
 
         return auth_code[0]
 
@@ -125,13 +174,14 @@ class SpotifyClient:
             "client_secret": self.client_secret
         }
 
-        response = requests.post(self.TOKEN_URL, data=token_data)
+        response = self._session.post(self.TOKEN_URL, data=token_data)
 
         if response.status_code == 200:
-            token_info = response.json()
+            token_info = self._parse_json(response)
             self.access_token = token_info["access_token"]
             self.refresh_token = token_info.get("refresh_token")
             self.token_expiry = time.time() + token_info.get("expires_in", 3600)
+            self._persist_tokens()
             print("Authentication successful!")
             return True
         else:
@@ -151,15 +201,16 @@ class SpotifyClient:
             "client_secret": self.client_secret
         }
 
-        response = requests.post(self.TOKEN_URL, data=token_data)
+        response = self._session.post(self.TOKEN_URL, data=token_data)
 
         if response.status_code == 200:
-            token_info = response.json()
+            token_info = self._parse_json(response)
             self.access_token = token_info["access_token"]
             self.token_expiry = time.time() + token_info.get("expires_in", 3600)
             # Refresh token may or may not be included
             if "refresh_token" in token_info:
                 self.refresh_token = token_info["refresh_token"]
+            self._persist_tokens()
             return True
         else:
             return False
@@ -170,57 +221,114 @@ class SpotifyClient:
             if self.refresh_token:
                 self._refresh_access_token()
 
-    def _make_api_request(self, method: str, endpoint: str, **kwargs) -> Optional[requests.Response]:
+    def _make_api_request(self, method: str, endpoint: str, max_retries: int = 3,
+                          **kwargs) -> Optional[requests.Response]:
         """
         Make an authenticated API request to Spotify.
 
+        Timeouts, connection errors, 429 and 5xx responses are retried with
+        exponential backoff (honouring Retry-After); a 401 triggers one token
+        refresh.
+
         Args:
             method: HTTP method (GET, PUT, POST, etc.)
             endpoint: API endpoint (without base URL)
+            max_retries: Maximum number of retries for transient failures
             **kwargs: Additional arguments to pass to requests
 
         Returns:
             Response object or None if request failed
         """
-        self._ensure_authenticated()
-
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
+        if time.time() >= self.token_expiry - 60:
+            self._ensure_authenticated()
 
         url = f"{self.API_BASE_URL}{endpoint}"
-
-        try:
-            print(f"🔍 DEBUG: {method} {url}")
-            response = requests.request(method, url, headers=headers, timeout=10, **kwargs)
-            print(f"🔍 DEBUG: Status code: {response.status_code}")
-            return response
-        except requests.exceptions.Timeout as e:
-            print(f"⚠ API request timed out: {e}")
-            return None
-        except requests.exceptions.RequestException as e:
-            print(f"⚠ API request failed: {e}")
-            return None
-
-    def get_current_playback(self) -> Optional[Dict[str, Any]]:
+        refreshed = False
+        response = None
+
+        for attempt in range(max_retries + 1):
+            headers = {"Authorization": self._auth_header, "Content-Type": "application/json"}
+
+            try:
+                logger.debug("%s %s", method, url)
+                response = self._session.request(method, url, headers=headers, timeout=10, **kwargs)
+                logger.debug("Status code: %s", response.status_code)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                if attempt == max_retries:
+                    print(f"⚠ API request failed after {max_retries + 1} attempts: {e}")
+                    return None
+                delay = self._backoff_delay(attempt)
+                print(f"⚠ API request error ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            except requests.exceptions.RequestException as e:
+                print(f"⚠ API request failed: {e}")
+                return None
+
+            # Expired or revoked token: refresh once and retry immediately
+            if response.status_code == 401 and not refreshed and self._refresh_access_token():
+                refreshed = True
+                continue
+
+            if response.status_code not in self.RETRYABLE_STATUS or attempt == max_retries:
+                return response
+
+            delay = self._backoff_delay(attempt)
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                if int(retry_after) > self.MAX_RETRY_AFTER:
+                    print(f"⚠ Spotify asked to retry after {retry_after}s, giving up")
+                    return response
+                delay = max(delay, int(retry_after))
+            print(f"⚠ Spotify returned {response.status_code}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+        return response
+
+    @staticmethod
+    def _parse_json(response: requests.Response) -> Any:
+        """Decode a JSON response body, using orjson when it's installed."""
+        if orjson:
+            return orjson.loads(response.content)
+        return response.json()
+
+    def _backoff_delay(self, attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+        """Exponential backoff with full jitter."""
+        return min(cap, random.uniform(0, base * (2 ** attempt)))
+
+    def get_current_playback(self, max_age: float = 0.5) -> Optional[Dict[str, Any]]:
         """
         Get information about current playback.
 
+        Args:
+            max_age: Reuse a result fetched within this many seconds
+
         Returns:
             Dictionary with playback information or None
         """
+        if time.monotonic() - self._playback_cache_ts < max_age:
+            return self._playback_cache
+
         response = self._make_api_request("GET", "/me/player/currently-playing?type=episode,track")
 
         if response and response.status_code == 200:
-            return response.json()
+            # Identical body to last time (e.g. while paused): skip the decode
+            fingerprint = response.headers.get("ETag") or hashlib.blake2b(response.content, digest_size=8).digest()
+            if fingerprint != self._playback_fingerprint:
+                self._playback_parsed = self._parse_json(response)
+                self._playback_fingerprint = fingerprint
+            playback = self._playback_parsed
         elif response and response.status_code == 204:
             print("No playback currently active")
-            return None
+            playback = None
         else:
             print(f"Failed to get playback info: {response.status_code if response else 'No response'}")
             return None
 
+        self._playback_cache = playback
+        self._playback_cache_ts = time.monotonic()
+        return playback
+
     def pause(self) -> bool:
         """
         Pause current playback.
@@ -228,6 +336,7 @@ class SpotifyClient:
         Returns:
             True if successful, False otherwise
         """
+        self.invalidate_playback_cache()
         response = self._make_api_request("PUT", "/me/player/pause")
 
         if response and response.status_code in [200, 204]:
@@ -252,11 +361,10 @@ class SpotifyClient:
         Returns:
             True if successful, False otherwise
         """
-        print(f"🔍 DEBUG: Making API request to /me/player/play")
-
         # Simple resume without device_id (let Spotify use default device)
+        self.invalidate_playback_cache()
         response = self._make_api_request("PUT", "/me/player/play")
-        print(f"🔍 DEBUG: Response object: {response}")
+        logger.debug("Resume response: %s", response)
 
         if response and response.status_code in [200, 204]:
             print("Playback resumed")
@@ -286,6 +394,7 @@ class SpotifyClient:
         Returns:
             True if successful, False otherwise
         """
+        self.invalidate_playback_cache()
         response = self._make_api_request("PUT", f"/me/player/seek?position_ms={position_ms}")
 
         if response and response.status_code in [200, 204]:
@@ -316,13 +425,30 @@ class SpotifyClient:
         currently_playing_type = playback.get("currently_playing_type")
         return currently_playing_type == "episode"
 
-    def get_playback_status(self) -> Dict[str, Any]:
+    def invalidate_playback_cache(self):
+        """Drop cached playback state after a state-changing request."""
+        self._playback_cache_ts = 0.0
+        self._status_cache = None
+
+    def get_playback_status(self, max_age: float = 2.0) -> Dict[str, Any]:
         """
         Get detailed playback status including what's playing and whether it's paused.
 
+        Args:
+            max_age: Reuse a status fetched within this many seconds
+
         Returns:
             Dictionary with status information
         """
+        if self._status_cache is not None and time.monotonic() - self._status_ts < max_age:
+            return self._status_cache
+
+        self._status_cache = self._fetch_playback_status()
+        self._status_ts = time.monotonic()
+        return self._status_cache
+
+    def _fetch_playback_status(self) -> Dict[str, Any]:
+        """Fetch playback status from the Spotify API."""
         playback = self.get_current_playback()
 
         if not playback:
@@ -369,8 +495,21 @@ class SpotifyClient:
             "refresh_token": self.refresh_token,
             "token_expiry": self.token_expiry
         }
-        with open(filepath, "w") as f:
+        # Write then rename so a crash can't leave a truncated token file
+        tmp_path = f"{filepath}.tmp"
+        with open(tmp_path, "w") as f:
             json.dump(tokens, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+
+    def _persist_tokens(self):
+        """Save tokens to token_cache_path, if configured."""
+        if self.token_cache_path:
+            try:
+                self.save_tokens(self.token_cache_path)
+            except OSError as e:
+                print(f"⚠ Could not save tokens: {e}")
 
     def load_tokens(self, filepath: str) -> bool:
         """Load access and refresh tokens from a file."""
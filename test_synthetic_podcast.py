@@ -17,7 +17,71 @@ from rss_manager import RSSManager
 from scribe_diarizer import ScribeDiarizer
 from voice_cloner import VoiceCloner
 from pydub import AudioSegment
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import heapq
+import subprocess
 import sys
+import tempfile
+
+
+def extract_speaker(speaker_id: str, ranges: list, audio_path: str, out_dir: str,
+                    target_duration: float = 10 * 60) -> Path:
+    """
+    Cut up to target_duration seconds of a speaker's longest blocks into one MP3.
+
+    Runs in a worker process, so it only takes plain picklable arguments.
+
+    Args:
+        speaker_id: Speaker label, used for the output filename
+        ranges: (start, end, duration) tuples in seconds, longest first
+        audio_path: Source episode MP3
+        out_dir: Directory to write <speaker_id>.mp3 into
+        target_duration: Seconds of audio to collect
+
+    Returns:
+        Path to the exported speaker MP3
+    """
+    chunks = []
+    total_extracted = 0
+
+    with tempfile.TemporaryDirectory() as block_dir:
+        for start, end, duration in ranges:
+            if total_extracted >= target_duration:
+                break
+
+            # Cut this block out with a stream copy so only it gets decoded
+            block_file = Path(block_dir) / f"{speaker_id}_{total_extracted:.0f}.mp3"
+            subprocess.run(
+                ["ffmpeg", "-y", "-loglevel", "error",
+                 "-ss", f"{start:.3f}", "-to", f"{end:.3f}",
+                 "-i", audio_path, "-c", "copy", str(block_file)],
+                check=True
+            )
+
+            # -threads 0 lets ffmpeg pick its decode thread count
+            chunks.append(AudioSegment.from_file(str(block_file), format="mp3", parameters=["-threads", "0"]))
+            total_extracted += duration
+
+            print(f"      ✓ {speaker_id}: added {duration/60:.1f} min block (total: {total_extracted/60:.1f} min)")
+
+    # Blocks share the source's format, so join their PCM in one copy
+    # instead of reallocating on every +=
+    if chunks:
+        first = chunks[0]
+        combined_audio = AudioSegment(
+            data=b"".join(c.raw_data for c in chunks),
+            sample_width=first.sample_width,
+            frame_rate=first.frame_rate,
+            channels=first.channels
+        )
+    else:
+        combined_audio = AudioSegment.empty()
+
+    # Save speaker audio
+    output_file = Path(out_dir) / f"{speaker_id}.mp3"
+    # LAME's fast algorithm (-q 7) is plenty for IVC training audio
+    combined_audio.export(str(output_file), format="mp3", bitrate="192k", parameters=["-compression_level", "7"])
+    return output_file
 
 
 def main():
@@ -95,10 +159,7 @@ def main():
     speaker_audio_dir = Path(__file__).parent / "speaker_audio_scribe"
     speaker_audio_dir.mkdir(exist_ok=True)
 
-    speaker_audio_files = {}
-
-    print("Loading audio file...")
-    full_audio = AudioSegment.from_mp3(str(audio_file))
+    speaker_ranges = {}
 
     for speaker_id, words in speakers.items():
         print(f"\n  Processing {speaker_id}...")
@@ -106,38 +167,30 @@ def main():
         # Group into continuous blocks
         blocks = diarizer.group_speaker_segments(words, min_gap_seconds=2.0)
 
-        # Sort blocks by duration (longest first)
-        blocks_with_duration = [(b, b[-1]['end'] - b[0]['start']) for b in blocks]
-        blocks_with_duration.sort(key=lambda x: x[1], reverse=True)
+        # Longest blocks first; only a handful are needed to reach 10 minutes
+        blocks_with_duration = heapq.nlargest(
+            30, ((b, b[-1]['end'] - b[0]['start']) for b in blocks), key=lambda x: x[1]
+        )
 
         print(f"    Found {len(blocks)} speech blocks")
         print(f"    Top 5 longest: {[f'{d/60:.1f}m' for b, d in blocks_with_duration[:5]]}")
 
-        # Extract up to 10 minutes from longest blocks
-        target_duration = 10 * 60  # 10 minutes
-        combined_audio = AudioSegment.empty()
-        total_extracted = 0
-
-        for block, duration in blocks_with_duration:
-            if total_extracted >= target_duration:
-                break
-
-            # Extract this block
-            start_ms = int(block[0]['start'] * 1000)
-            end_ms = int(block[-1]['end'] * 1000)
-
-            chunk = full_audio[start_ms:end_ms]
-            combined_audio += chunk
-            total_extracted += duration
-
-            print(f"      ✓ Added {duration/60:.1f} min block (total: {total_extracted/60:.1f} min)")
-
-        # Save speaker audio
-        output_file = speaker_audio_dir / f"{speaker_id}.mp3"
-        combined_audio.export(str(output_file), format="mp3", bitrate="192k")
+        speaker_ranges[speaker_id] = [(b[0]['start'], b[-1]['end'], d) for b, d in blocks_with_duration]
 
-        speaker_audio_files[speaker_id] = output_file
-        print(f"    💾 Saved: {output_file}")
+    # MP3 encoding is CPU-bound, so each speaker gets its own process
+    speaker_audio_files = {}
+    with ProcessPoolExecutor(max_workers=max(1, len(speaker_ranges))) as executor:
+        futures = {
+            executor.submit(extract_speaker, speaker_id, ranges, str(audio_file), str(speaker_audio_dir)): speaker_id
+            for speaker_id, ranges in speaker_ranges.items()
+        }
+        for future in as_completed(futures):
+            speaker_id = futures[future]
+            speaker_audio_files[speaker_id] = future.result()
+            print(f"    💾 Saved {speaker_id}: {speaker_audio_files[speaker_id]}")
+
+    # Keep the original speaker order for the later steps
+    speaker_audio_files = {sid: speaker_audio_files[sid] for sid in speaker_ranges}
 
     # Step 4: Create voice clones
     print("\n\n🎤 STEP 4: Create Voice Clones")
@@ -145,25 +198,32 @@ def main():
 
     cloner = VoiceCloner(api_key=Config.ELEVENLABS_API_KEY)
     voice_ids = {}
-
-    for speaker_id, audio_file_path in speaker_audio_files.items():
-        print(f"\n  Creating voice clone for {speaker_id}...")
-
-        voice_name = f"Acquired - {speaker_id}"
-        description = f"Voice cloned from Acquired podcast - {episode_title}"
-
-        voice_id = cloner.create_voice_clone(
-            name=voice_name,
-            audio_files=[audio_file_path],
-            description=description,
-            remove_background_noise=True
-        )
-
+    description = f"Voice cloned from Acquired podcast - {episode_title}"
+
+    # Uploads are independent, so run them concurrently
+    with ThreadPoolExecutor(max_workers=max(1, len(speaker_audio_files))) as executor:
+        futures = {}
+        for speaker_id, audio_file_path in speaker_audio_files.items():
+            print(f"\n  Creating voice clone for {speaker_id}...")
+            future = executor.submit(
+                cloner.create_voice_clone,
+                name=f"Acquired - {speaker_id}",
+                audio_files=[audio_file_path],
+                description=description,
+                remove_background_noise=True
+            )
+            futures[future] = speaker_id
+
+        clone_results = {futures[f]: f.result() for f in as_completed(futures)}
+
+    # Keep speaker order stable for the dialogue below
+    for speaker_id in speaker_audio_files:
+        voice_id = clone_results.get(speaker_id)
         if voice_id:
             voice_ids[speaker_id] = voice_id
-            print(f"    ✓ Voice clone created: {voice_id}")
+            print(f"    ✓ Voice clone created for {speaker_id}: {voice_id}")
         else:
-            print(f"    ❌ Failed to create voice clone")
+            print(f"    ❌ Failed to create voice clone for {speaker_id}")
 
     if len(voice_ids) < 2:
         print("\n❌ Need at least 2 voice clones to continue")
@@ -186,22 +246,23 @@ def main():
     synthetic_audio_dir = Path(__file__).parent / "synthetic_podcast"
     synthetic_audio_dir.mkdir(exist_ok=True)
 
-    generated_segments = []
-
-    for i, line in enumerate(dialogue):
+    def generate_line(indexed_line):
+        i, line = indexed_line
         speaker_id = line["speaker"]
-        text = line["text"]
-        voice_id = voice_ids[speaker_id]
+        return cloner.generate_speech(
+            text=line["text"],
+            voice_id=voice_ids[speaker_id],
+            output_path=synthetic_audio_dir / f"line_{i+1}_{speaker_id}.mp3"
+        )
 
-        print(f"\n  [{i+1}/{len(dialogue)}] {speaker_id}: \"{text[:50]}...\"")
+    # Lines are independent TTS calls; map() keeps results in dialogue order
+    with ThreadPoolExecutor(max_workers=min(6, len(dialogue))) as executor:
+        results = list(executor.map(generate_line, enumerate(dialogue)))
 
-        output_file = synthetic_audio_dir / f"line_{i+1}_{speaker_id}.mp3"
+    generated_segments = []
 
-        result = cloner.generate_speech(
-            text=text,
-            voice_id=voice_id,
-            output_path=output_file
-        )
+    for i, (line, result) in enumerate(zip(dialogue, results)):
+        print(f"\n  [{i+1}/{len(dialogue)}] {line['speaker']}: \"{line['text'][:50]}...\"")
 
         if result:
             generated_segments.append(result)
@@ -217,19 +278,36 @@ def main():
         print("❌ No audio segments to combine")
         sys.exit(1)
 
-    final_audio = AudioSegment.empty()
+    # ElevenLabs returns mp3_44100_128 (mono), so a matching silence clip lets
+    # ffmpeg's concat demuxer join everything without re-encoding
+    silence_file = synthetic_audio_dir / "silence_500.mp3"
+    if not silence_file.exists():
+        silence = AudioSegment.silent(duration=500, frame_rate=44100).set_channels(1)
+        silence.export(str(silence_file), format="mp3", bitrate="128k")
 
-    for segment_file in generated_segments:
-        audio = AudioSegment.from_mp3(str(segment_file))
-        final_audio += audio
-        # Add 0.5 second pause between speakers
-        final_audio += AudioSegment.silent(duration=500)
+    concat_list = synthetic_audio_dir / "concat_list.txt"
+    with open(concat_list, 'w') as f:
+        for segment_file in generated_segments:
+            f.write(f"file '{Path(segment_file).resolve()}'\n")
+            # Add 0.5 second pause between speakers
+            f.write(f"file '{silence_file.resolve()}'\n")
 
     final_output = Path(__file__).parent / "synthetic_acquired_test.mp3"
-    final_audio.export(str(final_output), format="mp3", bitrate="192k")
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+         "-i", str(concat_list), "-c", "copy", str(final_output)],
+        check=True
+    )
+
+    probe = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+         "-of", "default=noprint_wrappers=1:nokey=1", str(final_output)],
+        capture_output=True, text=True
+    )
 
     print(f"\n✓ Final podcast created: {final_output}")
-    print(f"  Duration: {len(final_audio) / 1000:.1f} seconds")
+    if probe.returncode == 0 and probe.stdout.strip():
+        print(f"  Duration: {float(probe.stdout):.1f} seconds")
     print(f"\n  Play with: open \"{final_output}\"")
 
     print("\n" + "=" * 70)
@@ -18,6 +18,11 @@ from rss_manager import RSSManager
 from scribe_diarizer import ScribeDiarizer
 from voice_cloner import VoiceCloner
 from pydub import AudioSegment
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import numpy as np
+import os
+import subprocess
 import sys
 
 
@@ -57,18 +62,33 @@ def main():
     if segment_file.exists():
         print(f"✓ 20-minute segment already exists: {segment_file}")
     else:
-        print("Loading full audio file...")
-        full_audio = AudioSegment.from_mp3(str(audio_file))
-
-        # Extract first 20 minutes (20 * 60 * 1000 ms)
-        twenty_min_ms = 20 * 60 * 1000
-        segment_audio = full_audio[:twenty_min_ms]
-
+        # Stream-copy the first 20 minutes (20 * 60 s); no decode or re-encode
         print(f"Saving 20-minute segment...")
-        segment_audio.export(str(segment_file), format="mp3", bitrate="192k")
+        subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-i", str(audio_file),
+             "-ss", "0", "-t", str(20 * 60), "-c:a", "copy", str(segment_file)],
+            check=True
+        )
         print(f"✓ Saved: {segment_file}")
         print(f"  Size: {segment_file.stat().st_size / (1024*1024):.1f} MB")
 
+    # Decode the segment to WAV once so later runs and Step 4 skip the MP3 decoder
+    segment_wav = segment_file.with_suffix('.wav')
+    if not segment_wav.exists():
+        # Decode under a temporary name so an interrupted run never leaves a
+        # truncated WAV for later runs to reuse
+        partial_wav = segment_wav.with_suffix('.partial.wav')
+        try:
+            subprocess.run(
+                ["ffmpeg", "-y", "-loglevel", "error", "-i", str(segment_file),
+                 "-f", "wav", "-acodec", "pcm_s16le", str(partial_wav)],
+                check=True
+            )
+        except BaseException:
+            partial_wav.unlink(missing_ok=True)
+            raise
+        partial_wav.replace(segment_wav)
+
     # Step 3: Transcribe and diarize with Scribe (20 min only!)
     print("\n\n🎙️  STEP 3: Scribe Diarization (20-min segment)")
     print("-" * 70)
@@ -89,7 +109,7 @@ def main():
         print("   Estimated cost: ~$0.05")
         print("   Auto-proceeding with transcription...")
 
-        scribe_result = diarizer.transcribe_with_diarization(segment_file, num_speakers=2)
+        scribe_result = diarizer.transcribe_in_chunks(segment_file, num_speakers=2)
 
         if not scribe_result:
             print("\n❌ Scribe transcription failed")
@@ -114,49 +134,84 @@ def main():
     print("\n\n🔊 STEP 4: Extract Speaker Audio")
     print("-" * 70)
 
-    speaker_audio_dir = Path(__file__).parent / "speaker_audio_scribe"
-    speaker_audio_dir.mkdir(exist_ok=True)
+    # Clips are keyed on the Scribe result they were cut from, in a directory
+    # of their own: test_synthetic_podcast.py writes longer, larger clips
+    # under the same speaker labels
+    scribe_digest = hashlib.blake2b(cache_file.read_bytes(), digest_size=8).hexdigest()
+    speaker_audio_dir = Path(__file__).parent / "speaker_audio_scribe_fast" / scribe_digest
+    speaker_audio_dir.mkdir(parents=True, exist_ok=True)
 
     speaker_audio_files = {}
-
-    print("Loading 20-minute segment audio...")
-    segment_audio = AudioSegment.from_mp3(str(segment_file))
+    segment_audio = None
 
     for speaker_id, words in speakers.items():
         print(f"\n  Processing {speaker_id}...")
 
+        # Reuse speaker audio from a previous run
+        output_file = speaker_audio_dir / f"{speaker_id}.mp3"
+        if output_file.exists():
+            speaker_audio_files[speaker_id] = output_file
+            print(f"    ✓ Using existing: {output_file}")
+            continue
+
+        # Only decode the segment if some speaker actually needs extracting
+        if segment_audio is None:
+            print("Loading 20-minute segment audio...")
+            segment_audio = AudioSegment.from_wav(str(segment_wav))
+            frame_rate = segment_audio.frame_rate
+            samples = np.frombuffer(segment_audio.raw_data, dtype=np.int16).reshape(-1, segment_audio.channels)
+
         # Group into continuous blocks
         blocks = diarizer.group_speaker_segments(words, min_gap_seconds=2.0)
 
-        # Sort blocks by duration (longest first)
-        blocks_with_duration = [(b, b[-1]['end'] - b[0]['start']) for b in blocks]
-        blocks_with_duration.sort(key=lambda x: x[1], reverse=True)
+        # Block durations as one array, ordered longest first
+        block_starts = np.fromiter((b[0]['start'] for b in blocks), dtype=np.float64, count=len(blocks))
+        block_ends = np.fromiter((b[-1]['end'] for b in blocks), dtype=np.float64, count=len(blocks))
+        durations = block_ends - block_starts
+        order = np.argsort(-durations, kind='stable')
 
         print(f"    Found {len(blocks)} speech blocks")
-        print(f"    Top 5 longest: {[f'{d/60:.1f}m' for b, d in blocks_with_duration[:5]]}")
+        print(f"    Top 5 longest: {[f'{d/60:.1f}m' for d in durations[order[:5]]]}")
 
         # Extract up to 5 minutes from longest blocks (to stay under 11MB file size limit)
         target_duration = 5 * 60  # 5 minutes
-        combined_audio = AudioSegment.empty()
+        views = []
         total_extracted = 0
 
-        for block, duration in blocks_with_duration:
+        for i in order:
             if total_extracted >= target_duration:
                 break
 
             # Extract this block
-            start_ms = int(block[0]['start'] * 1000)
-            end_ms = int(block[-1]['end'] * 1000)
+            duration = durations[i]
+            start = int(block_starts[i] * frame_rate)
+            end = int(block_ends[i] * frame_rate)
 
-            chunk = segment_audio[start_ms:end_ms]
-            combined_audio += chunk
+            views.append(samples[start:end])
             total_extracted += duration
 
             print(f"      ✓ Added {duration/60:.1f} min block (total: {total_extracted/60:.1f} min)")
 
-        # Save speaker audio
-        output_file = speaker_audio_dir / f"{speaker_id}.mp3"
-        combined_audio.export(str(output_file), format="mp3", bitrate="192k")
+        # Copy the selected blocks once and pipe the PCM straight into the
+        # encoder; 96k keeps uploads well under the 11MB limit, and LAME's
+        # fast algorithm (-q 7) is plenty for IVC training audio
+        combined = np.concatenate(views, axis=0) if views else samples[:0]
+
+        # Encode to a temporary file so a failed run never leaves a partial
+        # MP3 where the next run would reuse it
+        partial_file = output_file.with_suffix('.partial.mp3')
+        encoder = subprocess.Popen(
+            ["ffmpeg", "-y", "-loglevel", "error",
+             "-f", "s16le", "-ar", str(frame_rate), "-ac", str(segment_audio.channels), "-i", "-",
+             "-c:a", "libmp3lame", "-b:a", "96k", "-compression_level", "7", str(partial_file)],
+            stdin=subprocess.PIPE
+        )
+        encoder.communicate(combined.tobytes())
+        if encoder.returncode != 0:
+            partial_file.unlink(missing_ok=True)
+            print(f"    ❌ Failed to encode audio for {speaker_id}")
+            continue
+        os.replace(partial_file, output_file)
 
         speaker_audio_files[speaker_id] = output_file
         print(f"    💾 Saved: {output_file}")
@@ -165,65 +220,80 @@ def main():
     print("\n\n🎤 STEP 5: Create Voice Clones")
     print("-" * 70)
 
-    cloner = VoiceCloner(api_key=Config.ELEVENLABS_API_KEY)
-    voice_ids = {}
-
-    for speaker_id, audio_file_path in speaker_audio_files.items():
-        print(f"\n  Creating voice clone for {speaker_id}...")
-
-        voice_name = f"Acquired - {speaker_id}"
-        description = f"Voice cloned from Acquired podcast - {episode_title}"
-
-        voice_id = cloner.create_voice_clone(
-            name=voice_name,
-            audio_files=[audio_file_path],
-            description=description,
-            remove_background_noise=True
-        )
-
-        if voice_id:
-            voice_ids[speaker_id] = voice_id
-            print(f"    ✓ Voice clone created: {voice_id}")
-        else:
-            print(f"    ❌ Failed to create voice clone")
-
-    if len(voice_ids) < 2:
+    if len(speaker_audio_files) < 2:
         print("\n❌ Need at least 2 voice clones to continue")
         sys.exit(1)
 
-    # Step 6: Generate synthetic podcast
-    print("\n\n🎬 STEP 6: Generate Synthetic Podcast")
-    print("-" * 70)
+    cloner = VoiceCloner(api_key=Config.ELEVENLABS_API_KEY)
+    voice_ids = {}
+    description = f"Voice cloned from Acquired podcast - {episode_title}"
 
-    # Define the dialogue
+    # Define the dialogue up front so each speaker's lines can start as
+    # soon as their clone is ready
+    hosts = list(speaker_audio_files.keys())
     dialogue = [
-        {"speaker": list(voice_ids.keys())[0], "text": "Hey everyone, welcome back to Acquired!"},
-        {"speaker": list(voice_ids.keys())[1], "text": "Today we're doing something a little different - we're testing AI voice cloning."},
-        {"speaker": list(voice_ids.keys())[0], "text": "That's right! These voices you're hearing are actually synthetic, generated using ElevenLabs."},
-        {"speaker": list(voice_ids.keys())[1], "text": "Pretty wild, right? The technology has come so far."},
-        {"speaker": list(voice_ids.keys())[0], "text": "It's amazing what's possible with just ten minutes of training audio."},
-        {"speaker": list(voice_ids.keys())[1], "text": "Absolutely. Thanks for listening to this experimental episode!"},
+        {"speaker": hosts[0], "text": "Hey everyone, welcome back to Acquired!"},
+        {"speaker": hosts[1], "text": "Today we're doing something a little different - we're testing AI voice cloning."},
+        {"speaker": hosts[0], "text": "That's right! These voices you're hearing are actually synthetic, generated using ElevenLabs."},
+        {"speaker": hosts[1], "text": "Pretty wild, right? The technology has come so far."},
+        {"speaker": hosts[0], "text": "It's amazing what's possible with just ten minutes of training audio."},
+        {"speaker": hosts[1], "text": "Absolutely. Thanks for listening to this experimental episode!"},
     ]
 
     synthetic_audio_dir = Path(__file__).parent / "synthetic_podcast"
     synthetic_audio_dir.mkdir(exist_ok=True)
 
-    generated_segments = []
+    # Step 6 (pipelined): TTS for a speaker's lines starts while other clones
+    # are still being created. generate_speech enforces the concurrency limit.
+    line_futures = {}
+    with ThreadPoolExecutor(max_workers=len(hosts) + cloner.max_concurrent) as executor:
+        clone_futures = {}
+        for speaker_id, audio_file_path in speaker_audio_files.items():
+            print(f"\n  Creating voice clone for {speaker_id}...")
+            future = executor.submit(
+                cloner.create_voice_clone,
+                name=f"Acquired - {speaker_id}",
+                audio_files=[audio_file_path],
+                description=description,
+                remove_background_noise=True
+            )
+            clone_futures[future] = speaker_id
+
+        for future in as_completed(clone_futures):
+            speaker_id = clone_futures[future]
+            voice_id = future.result()
+
+            if not voice_id:
+                print(f"    ❌ Failed to create voice clone for {speaker_id}")
+                continue
 
-    for i, line in enumerate(dialogue):
-        speaker_id = line["speaker"]
-        text = line["text"]
-        voice_id = voice_ids[speaker_id]
+            voice_ids[speaker_id] = voice_id
+            print(f"    ✓ Voice clone created for {speaker_id}: {voice_id}")
+
+            for i, line in enumerate(dialogue):
+                if line["speaker"] == speaker_id:
+                    line_futures[i] = executor.submit(
+                        cloner.generate_speech,
+                        text=line["text"],
+                        voice_id=voice_id,
+                        output_path=synthetic_audio_dir / f"line_{i+1}_{speaker_id}.mp3"
+                    )
+
+        if not all(host in voice_ids for host in hosts[:2]):
+            for future in line_futures.values():
+                future.cancel()
+            print("\n❌ Need at least 2 voice clones to continue")
+            sys.exit(1)
 
-        print(f"\n  [{i+1}/{len(dialogue)}] {speaker_id}: \"{text[:50]}...\"")
+        print("\n\n🎬 STEP 6: Generate Synthetic Podcast")
+        print("-" * 70)
 
-        output_file = synthetic_audio_dir / f"line_{i+1}_{speaker_id}.mp3"
+        results = [line_futures[i].result() for i in range(len(dialogue))]
 
-        result = cloner.generate_speech(
-            text=text,
-            voice_id=voice_id,
-            output_path=output_file
-        )
+    generated_segments = []
+
+    for i, (line, result) in enumerate(zip(dialogue, results)):
+        print(f"\n  [{i+1}/{len(dialogue)}] {line['speaker']}: \"{line['text'][:50]}...\"")
 
         if result:
             generated_segments.append(result)
@@ -239,19 +309,39 @@ def main():
         print("❌ No audio segments to combine")
         sys.exit(1)
 
-    final_audio = AudioSegment.empty()
+    # ElevenLabs returns mp3_44100_128 (mono), so a matching silence clip lets
+    # ffmpeg's concat demuxer join everything without re-encoding
+    silence_file = synthetic_audio_dir / "silence_500.mp3"
+    if not silence_file.exists():
+        subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", "anullsrc=r=44100:cl=mono",
+             "-t", "0.5", "-b:a", "128k", str(silence_file)],
+            check=True
+        )
 
-    for segment_file in generated_segments:
-        audio = AudioSegment.from_mp3(str(segment_file))
-        final_audio += audio
-        # Add 0.5 second pause between speakers
-        final_audio += AudioSegment.silent(duration=500)
+    concat_list = synthetic_audio_dir / "concat_list.txt"
+    with open(concat_list, 'w') as f:
+        for line_file in generated_segments:
+            f.write(f"file '{Path(line_file).resolve()}'\n")
+            # Add 0.5 second pause between speakers
+            f.write(f"file '{silence_file.resolve()}'\n")
 
     final_output = Path(__file__).parent / "synthetic_acquired_test.mp3"
-    final_audio.export(str(final_output), format="mp3", bitrate="192k")
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+         "-i", str(concat_list), "-c", "copy", str(final_output)],
+        check=True
+    )
+
+    probe = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+         "-of", "default=noprint_wrappers=1:nokey=1", str(final_output)],
+        capture_output=True, text=True
+    )
 
     print(f"\n✓ Final podcast created: {final_output}")
-    print(f"  Duration: {len(final_audio) / 1000:.1f} seconds")
+    if probe.returncode == 0 and probe.stdout.strip():
+        print(f"  Duration: {float(probe.stdout):.1f} seconds")
     print(f"\n  Play with: open \"{final_output}\"")
 
     print("\n" + "=" * 70)
@@ -3,7 +3,13 @@ Speech transcription module using Google Speech Recognition.
 Records audio from microphone and converts it to text.
 """
 
+import datetime
+import numpy as np
+import pyaudio
 import speech_recognition as sr
+import tempfile
+import webrtcvad
+from pathlib import Path
 from typing import Optional
 import time
 
@@ -11,17 +17,59 @@ import time
 class SpeechTranscriber:
     """Handles recording and transcribing speech from microphone."""
 
-    def __init__(self):
-        """Initialize the speech recognizer."""
+    def __init__(self, sample_rate: int = 16000, frame_duration_ms: int = 20,
+                 aggressiveness: int = 2, hangover_ms: int = 200):
+        """
+        Initialize the speech recognizer.
+
+        Args:
+            sample_rate: Recording sample rate (8000, 16000, or 32000 Hz for WebRTC VAD)
+            frame_duration_ms: VAD frame duration in ms (10, 20, or 30)
+            aggressiveness: VAD aggressiveness (0-3, higher = more aggressive)
+            hangover_ms: Silence after speech that ends the phrase
+        """
         self.recognizer = sr.Recognizer()
 
-        # Adjust these for better recognition
-        self.recognizer.energy_threshold = 300  # Minimum audio energy to consider for recording
-        self.recognizer.dynamic_energy_threshold = True  # Automatically adjust energy threshold
-        self.recognizer.pause_threshold = 0.8  # Seconds of silence to consider end of phrase
+        # WebRTC VAD endpointing: decides speech/non-speech per 20ms frame, so
+        # a phrase ends after hangover_ms of silence rather than a 0.8s pause
+        self.sample_rate = sample_rate
+        self.frame_duration_ms = frame_duration_ms
+        self.frame_size = int(sample_rate * frame_duration_ms / 1000)
+        self.vad = webrtcvad.Vad(aggressiveness)
+        self.hangover_frames = max(1, hangover_ms // frame_duration_ms)
+        self.padding_frames = max(1, 300 // frame_duration_ms)  # Pre-roll kept before speech starts
+
+        # Pre-roll ring, preallocated once: one byte of VAD flag per frame
+        # alongside the frames' PCM, so waiting for speech allocates nothing
+        self.frame_bytes = self.frame_size * 2  # 16-bit samples
+        self._preroll_flags = np.zeros(self.padding_frames, dtype=np.uint8)
+        self._preroll_audio = bytearray(self.padding_frames * self.frame_bytes)
+
+        # The input stream is opened once and only started/stopped per phrase
+        self.audio = None
+        self.stream = None
+
+        # Last recording for voice-to-voice; only written to disk when asked for
+        self._pending_audio = None
+        self._last_audio_file = None
+
+    @property
+    def last_audio_file(self) -> Optional[Path]:
+        """Path to a WAV of the last recording, written on first access."""
+        if self._pending_audio is not None:
+            temp_dir = Path(tempfile.gettempdir()) / "podchat"
+            temp_dir.mkdir(exist_ok=True)
+
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            audio_file = temp_dir / f"recording_{timestamp}.wav"
+
+            with open(audio_file, "wb") as f:
+                f.write(self._pending_audio.get_wav_data())
+
+            self._last_audio_file = audio_file
+            self._pending_audio = None
 
-        # Store last recorded audio file path for voice-to-voice
-        self.last_audio_file = None
+        return self._last_audio_file
 
     def list_microphones(self):
         """List available microphone devices."""
@@ -29,6 +77,90 @@ class SpeechTranscriber:
         for index, name in enumerate(sr.Microphone.list_microphone_names()):
             print(f"  [{index}] {name}")
 
+    def _record_phrase(self, timeout: float, phrase_time_limit: Optional[float]) -> Optional[bytes]:
+        """
+        Record a single phrase, using VAD to detect where it starts and ends.
+
+        Args:
+            timeout: Maximum seconds to wait for speech to start
+            phrase_time_limit: Maximum seconds for the phrase (None = no limit)
+
+        Returns:
+            16-bit mono PCM of the phrase, or None if no speech started in time
+        """
+        if self.stream is None:
+            if self.audio is None:
+                self.audio = pyaudio.PyAudio()
+            self.stream = self.audio.open(
+                format=pyaudio.paInt16,
+                channels=1,
+                rate=self.sample_rate,
+                input=True,
+                # Larger host buffer so PortAudio absorbs Python jitter;
+                # reads still pull one VAD frame at a time
+                frames_per_buffer=self.frame_size * 4,
+            )
+        else:
+            self.stream.start_stream()
+
+        stream = self.stream
+        try:
+            flags, audio = self._preroll_flags, self._preroll_audio
+            n, fb = self.padding_frames, self.frame_bytes
+            head = filled = voiced = 0
+            max_wait_frames = int(timeout * 1000 / self.frame_duration_ms)
+            max_phrase_frames = int(phrase_time_limit * 1000 / self.frame_duration_ms) if phrase_time_limit else None
+
+            # Wait for speech to start
+            for _ in range(max_wait_frames):
+                frame = stream.read(self.frame_size, exception_on_overflow=False)
+                is_speech = int(self.vad.is_speech(frame, self.sample_rate))
+
+                # Overwrite the oldest slot, keeping the voiced count in step
+                if filled == n:
+                    voiced -= int(flags[head])
+                else:
+                    filled += 1
+                flags[head] = is_speech
+                voiced += is_speech
+                audio[head * fb:(head + 1) * fb] = frame
+                head = (head + 1) % n
+
+                if voiced > 0.6 * n:
+                    break
+            else:
+                return None
+
+            # Record until enough trailing silence or the phrase limit,
+            # starting from the pre-roll in chronological order
+            if filled < n:
+                frames = [bytes(audio[:filled * fb])]
+            else:
+                frames = [bytes(audio[head * fb:]), bytes(audio[:head * fb])]
+            recorded = filled
+            silent_frames = 0
+            while silent_frames < self.hangover_frames:
+                if max_phrase_frames and recorded >= max_phrase_frames:
+                    break
+                frame = stream.read(self.frame_size, exception_on_overflow=False)
+                frames.append(frame)
+                recorded += 1
+                silent_frames = 0 if self.vad.is_speech(frame, self.sample_rate) else silent_frames + 1
+
+            return b"".join(frames)
+        finally:
+            # Stop rather than close so the next phrase skips the device open
+            stream.stop_stream()
+
+    def cleanup(self):
+        """Close the microphone stream and release PyAudio."""
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if self.audio:
+            self.audio.terminate()
+            self.audio = None
+
     def transcribe_from_microphone(self, timeout: int = 10, phrase_time_limit: Optional[int] = None) -> Optional[str]:
         """
         Record audio from microphone and transcribe it to text.
@@ -41,46 +173,31 @@ class SpeechTranscriber:
             Transcribed text or None if transcription failed
         """
         try:
-            with sr.Microphone() as source:
-                print("🔴 Listening... speak now!")
-
-                # Listen for audio
-                try:
-                    audio = self.recognizer.listen(
-                        source,
-                        timeout=timeout,
-                        phrase_time_limit=phrase_time_limit
-                    )
-                    print("⏸  Processing...")
-                except sr.WaitTimeoutError:
-                    print("⚠️  No speech detected (timeout)")
-                    return None
-
-                # Save audio to file for voice-to-voice conversion
-                from pathlib import Path
-                import tempfile
-                temp_dir = Path(tempfile.gettempdir()) / "podchat"
-                temp_dir.mkdir(exist_ok=True)
-
-                import datetime
-                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                audio_file = temp_dir / f"recording_{timestamp}.wav"
-
-                with open(audio_file, "wb") as f:
-                    f.write(audio.get_wav_data())
-
-                self.last_audio_file = audio_file
-
-                # Transcribe using Google Speech Recognition
-                try:
-                    text = self.recognizer.recognize_google(audio)
-                    return text
-                except sr.UnknownValueError:
-                    print("⚠️  Could not understand audio")
-                    return None
-                except sr.RequestError as e:
-                    print(f"⚠️  Could not request results from Google Speech Recognition; {e}")
-                    return None
+            print("🔴 Listening... speak now!")
+
+            # Listen for audio
+            pcm = self._record_phrase(timeout, phrase_time_limit)
+            if pcm is None:
+                print("⚠️  No speech detected (timeout)")
+                return None
+
+            audio = sr.AudioData(pcm, self.sample_rate, 2)
+            print("⏸  Processing...")
+
+            # Keep the audio for voice-to-voice; last_audio_file writes it on demand
+            self._pending_audio = audio
+            self._last_audio_file = None
+
+            # Transcribe using Google Speech Recognition
+            try:
+                text = self.recognizer.recognize_google(audio)
+                return text
+            except sr.UnknownValueError:
+                print("⚠️  Could not understand audio")
+                return None
+            except sr.RequestError as e:
+                print(f"⚠️  Could not request results from Google Speech Recognition; {e}")
+                return None
 
         except OSError as e:
             print(f"⚠️  Microphone error: {e}")
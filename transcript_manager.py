@@ -9,6 +9,11 @@ from pathlib import Path
 from typing import Optional, Dict, Any, List
 from youtube_matcher import YouTubeMatcher
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class TranscriptManager:
     """Manages transcript fetching and caching."""
@@ -26,6 +31,7 @@ class TranscriptManager:
 
         self.youtube_matcher = YouTubeMatcher(api_key=youtube_api_key)
         self.current_transcript = None
+        self._timestamp_index = None
         self.current_episode_id = None
         self.current_video_id = None
 
@@ -42,7 +48,21 @@ class TranscriptManager:
         show = episode_info.get('show', '')
         title = episode_info.get('title', '')
         content = f"{show}|{title}".lower()
-        return hashlib.md5(content.encode()).hexdigest()
+        return "b2_" + hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+    def _migrate_legacy_cache(self, episode_info: Dict[str, Any], cache_key: str):
+        """Rename a cache file written under the old MD5 key to its current key."""
+        show = episode_info.get('show', '')
+        title = episode_info.get('title', '')
+        legacy_key = hashlib.md5(f"{show}|{title}".lower().encode()).hexdigest()
+
+        legacy_path = self._get_cache_path(legacy_key)
+        cache_path = self._get_cache_path(cache_key)
+        if legacy_path.exists() and not cache_path.exists():
+            try:
+                legacy_path.replace(cache_path)
+            except OSError as e:
+                print(f"Warning: Could not migrate cache: {e}")
 
     def _get_cache_path(self, cache_key: str) -> Path:
         """Get the file path for a cached transcript."""
@@ -64,6 +84,9 @@ class TranscriptManager:
             return None
 
         try:
+            if orjson:
+                with open(cache_path, 'rb') as f:
+                    return orjson.loads(f.read())
             with open(cache_path, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except Exception as e:
@@ -81,8 +104,12 @@ class TranscriptManager:
         cache_path = self._get_cache_path(cache_key)
 
         try:
-            with open(cache_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
+            if orjson:
+                with open(cache_path, 'wb') as f:
+                    f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+            else:
+                with open(cache_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=2)
         except Exception as e:
             print(f"Warning: Could not save cache: {e}")
 
@@ -105,7 +132,7 @@ class TranscriptManager:
         if not transcript:
             return False
 
-        self.current_transcript = transcript
+        self._set_transcript(transcript)
         self.current_video_id = video_id
 
         # Cache if we have episode info
@@ -139,11 +166,12 @@ class TranscriptManager:
 
         # Try to load from cache first
         print(f"\nLooking for transcript...")
+        self._migrate_legacy_cache(episode_info, cache_key)
         cached_data = self._load_from_cache(cache_key)
 
         if cached_data:
             print(f"✓ Found cached transcript ({len(cached_data['transcript'])} segments)")
-            self.current_transcript = cached_data['transcript']
+            self._set_transcript(cached_data['transcript'])
             self.current_video_id = cached_data.get('video_id')
             return True
 
@@ -176,9 +204,14 @@ class TranscriptManager:
         }
         self._save_to_cache(cache_key, cache_data)
 
-        self.current_transcript = transcript
+        self._set_transcript(transcript)
         return True
 
+    def _set_transcript(self, transcript: List[Dict[str, Any]]):
+        """Make a transcript current and index its segment start times."""
+        self.current_transcript = transcript
+        self._timestamp_index = self.youtube_matcher.build_timestamp_index(transcript)
+
     def get_text_at_timestamp(self, timestamp_seconds: float, context_seconds: int = 30) -> Optional[str]:
         """
         Get transcript text at a specific timestamp.
@@ -196,7 +229,8 @@ class TranscriptManager:
         return self.youtube_matcher.find_transcript_at_timestamp(
             self.current_transcript,
             timestamp_seconds,
-            context_seconds
+            context_seconds,
+            index=self._timestamp_index
         )
 
     def get_full_transcript(self) -> Optional[List[Dict[str, Any]]]:
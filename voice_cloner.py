@@ -3,23 +3,81 @@ ElevenLabs Voice Cloning Integration
 Handles voice cloning from podcast audio files.
 """
 
-from typing import Optional, List
+from typing import Optional, List, Iterator
 from pathlib import Path
 from elevenlabs.client import ElevenLabs
+import httpx
+import hashlib
+import mimetypes
 import os
+import shutil
+import threading
+import time
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    """Check whether an ElevenLabs error is a 429 / too-many-concurrent-requests."""
+    return getattr(error, 'status_code', None) == 429 or 'too_many_concurrent_requests' in str(error)
+
+
+class _AIMDLimiter:
+    """
+    Concurrency limiter that adapts to server pushback.
+
+    Halves the limit on a rate-limit response and adds one slot back after
+    a run of successes, never exceeding the configured maximum.
+    """
+
+    def __init__(self, max_limit: int, increase_after: int = 10):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.increase_after = increase_after
+        self.active = 0
+        self.successes = 0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        with self.cond:
+            while self.active >= self.limit:
+                self.cond.wait()
+            self.active += 1
+
+    def release(self, throttled: bool = False):
+        with self.cond:
+            self.active -= 1
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+                self.successes = 0
+            else:
+                self.successes += 1
+                if self.successes >= self.increase_after and self.limit < self.max_limit:
+                    self.limit += 1
+                    self.successes = 0
+            self.cond.notify_all()
 
 
 class VoiceCloner:
     """Manages ElevenLabs voice cloning operations."""
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, max_concurrent: int = 2,
+                 cache_dir: Optional[Path] = None, use_cache: bool = True):
         """
         Initialize ElevenLabs client.
 
         Args:
             api_key: ElevenLabs API key (optional, can use env var)
+            max_concurrent: Max simultaneous TTS requests (set to your plan's concurrency limit)
+            cache_dir: Directory to cache generated speech in
+            use_cache: Set False to always call the API
         """
         self.api_key = api_key or os.getenv("ELEVENLABS_API_KEY")
+        self.max_concurrent = max_concurrent
+        self._tts_limiter = _AIMDLimiter(max_concurrent)
+
+        self.cache_dir = None
+        if use_cache:
+            self.cache_dir = cache_dir or Path(__file__).parent / ".tts_cache"
+            self.cache_dir.mkdir(exist_ok=True)
 
         if not self.api_key:
             print("⚠️  Warning: No ElevenLabs API key found")
@@ -27,7 +85,13 @@ class VoiceCloner:
             self.client = None
         else:
             try:
-                self.client = ElevenLabs(api_key=self.api_key)
+                # One pooled HTTP/2 client shared by every request, so TTS calls
+                # reuse warm connections instead of repeating TLS handshakes
+                self.http_client = httpx.Client(
+                    http2=True,
+                    limits=httpx.Limits(max_keepalive_connections=8, keepalive_expiry=30)
+                )
+                self.client = ElevenLabs(api_key=self.api_key, httpx_client=self.http_client)
                 print("✓ ElevenLabs client initialized")
             except Exception as e:
                 print(f"⚠️  Could not initialize ElevenLabs client: {e}")
@@ -74,23 +138,21 @@ class VoiceCloner:
             if description:
                 print(f"   Description: {description}")
 
-            # Open files as binary for upload
-            file_handles = []
+            # IVC samples are capped at ~11MB, so read each one in a single
+            # call and upload (filename, bytes, content type) tuples
+            uploads = []
             for file_path in valid_files:
-                file_handles.append(open(file_path, 'rb'))
-
-            try:
-                # Create voice clone using IVC
-                voice = self.client.voices.ivc.create(
-                    name=name,
-                    description=description,
-                    files=file_handles,
-                    remove_background_noise=remove_background_noise
-                )
-            finally:
-                # Close all file handles
-                for fh in file_handles:
-                    fh.close()
+                file_path = Path(file_path)
+                content_type = mimetypes.guess_type(file_path.name)[0] or "audio/mpeg"
+                uploads.append((file_path.name, file_path.read_bytes(), content_type))
+
+            # Create voice clone using IVC
+            voice = self.client.voices.ivc.create(
+                name=name,
+                description=description,
+                files=uploads,
+                remove_background_noise=remove_background_noise
+            )
 
             voice_id = voice.voice_id
             requires_verification = getattr(voice, 'requires_verification', False)
@@ -159,39 +221,115 @@ class VoiceCloner:
         Returns:
             Path to generated audio file or None
         """
+        model_id = "eleven_multilingual_v2"
+
+        # Same voice, model and text always produce the same clip
+        cache_path = None
+        if self.cache_dir and output_path:
+            key = hashlib.sha256(f"{voice_id}|{model_id}|{text}".encode()).hexdigest()
+            cache_path = self.cache_dir / f"{key}.mp3"
+            if cache_path.exists():
+                output_path = Path(output_path)
+                output_path.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(cache_path, output_path)
+                print(f"✓ Loaded cached speech: {output_path}")
+                return output_path
+
         if not self.client:
             print("⚠️  ElevenLabs client not available")
             return None
 
         try:
             print(f"\n🔊 Generating speech with voice {voice_id}...")
+            audio = self._limited_stream(text, voice_id, model_id)
 
-            # Generate audio using text_to_speech
-            audio = self.client.text_to_speech.convert(
-                voice_id=voice_id,
-                text=text,
-                model_id="eleven_multilingual_v2"
-            )
+            if not output_path:
+                # Return generator for streaming
+                return audio
 
-            # Save to file if path provided
-            if output_path:
-                output_path = Path(output_path)
-                output_path.parent.mkdir(parents=True, exist_ok=True)
+            # Save to file as chunks arrive
+            output_path = Path(output_path)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
 
-                with open(output_path, 'wb') as f:
-                    for chunk in audio:
-                        f.write(chunk)
+            with open(output_path, 'wb', buffering=1 << 20) as f:
+                for chunk in audio:
+                    f.write(chunk)
 
-                print(f"✓ Audio saved to: {output_path}")
-                return output_path
-            else:
-                # Return generator for streaming
-                return audio
+            if cache_path:
+                # Copy under a temporary name so an interrupted copy is never
+                # mistaken for a cached clip
+                partial_path = cache_path.with_suffix('.partial')
+                shutil.copyfile(output_path, partial_path)
+                os.replace(partial_path, cache_path)
+
+            print(f"✓ Audio saved to: {output_path}")
+            return output_path
 
         except Exception as e:
             print(f"✗ Failed to generate speech: {e}")
             return None
 
+    def _limited_stream(self, text: str, voice_id: str, model_id: str) -> Iterator[bytes]:
+        """
+        Stream TTS audio while holding a concurrency slot.
+
+        The slot is held for as long as the caller iterates, so lazily
+        consumed streams count against the limit too. A rate-limited request
+        is retried with backoff (up to 3 attempts) as long as no audio has
+        been yielded yet.
+
+        Args:
+            text: Text to convert to speech
+            voice_id: ID of the voice to use
+            model_id: ElevenLabs TTS model
+
+        Yields:
+            MP3 audio chunks
+        """
+        for attempt in range(3):
+            # Stay within the account's (adaptive) concurrent request limit
+            self._tts_limiter.acquire()
+            throttled = False
+            started = False
+            try:
+                for chunk in self.client.text_to_speech.stream(
+                    voice_id=voice_id,
+                    text=text,
+                    model_id=model_id,
+                    output_format="mp3_44100_128"
+                ):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                throttled = _is_rate_limited(e)
+                if not throttled or started or attempt == 2:
+                    raise
+            finally:
+                self._tts_limiter.release(throttled)
+
+            print(f"⚠️  Rate limited, retrying with {self._tts_limiter.limit} concurrent request(s)...")
+            time.sleep(2 ** attempt)
+
+    def stream_speech(self, text: str, voice_id: str,
+                      model_id: str = "eleven_multilingual_v2") -> Optional[Iterator[bytes]]:
+        """
+        Stream speech audio using a cloned voice.
+
+        Args:
+            text: Text to convert to speech
+            voice_id: ID of the voice to use
+            model_id: ElevenLabs TTS model
+
+        Returns:
+            Iterator of MP3 audio chunks as they are generated, or None
+        """
+        if not self.client:
+            print("⚠️  ElevenLabs client not available")
+            return None
+
+        return self._limited_stream(text, voice_id, model_id)
+
 
 # Test function
 def test_voice_cloner():
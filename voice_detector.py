@@ -4,34 +4,131 @@ Detects when the user is speaking through the microphone.
 """
 
 import collections
+import ctypes
+import numpy as np
+import os
+import sys
 import pyaudio
+import queue
 import webrtcvad
 import time
 from typing import Callable, Optional
 import threading
 
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _jit(func):
+    """Compile func with numba when it's installed, else run it as plain Python."""
+    return numba.njit(cache=True, nogil=True)(func) if numba else func
+
+
+@_jit
+def _advance_ring(ring, idx, filled, voiced, is_speech):
+    """
+    Push one VAD flag into a uint8 ring, keeping the voiced count in step.
+
+    Returns:
+        Tuple of (next index, number of filled slots, voiced count)
+    """
+    maxlen = ring.shape[0]
+    if filled == maxlen:
+        voiced -= int(ring[idx])
+    else:
+        filled += 1
+    ring[idx] = is_speech
+    voiced += is_speech
+    return (idx + 1) % maxlen, filled, voiced
+
+
+def _raise_thread_priority(thread: threading.Thread) -> Optional[str]:
+    """
+    Ask the OS to schedule an audio thread ahead of ordinary threads.
+
+    Tries SCHED_FIFO on Linux (needs CAP_SYS_NICE) and falls back to a
+    negative nice value for just that thread; on Windows uses
+    THREAD_PRIORITY_TIME_CRITICAL. Other platforms are left alone.
+
+    Args:
+        thread: A started thread
+
+    Returns:
+        Name of the policy applied, or None if the OS refused all of them
+    """
+    tid = thread.native_id
+
+    if sys.platform == 'win32':
+        THREAD_SET_INFORMATION = 0x0020
+        THREAD_PRIORITY_TIME_CRITICAL = 15
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenThread(THREAD_SET_INFORMATION, False, tid)
+        if not handle:
+            return None
+        try:
+            if kernel32.SetThreadPriority(handle, THREAD_PRIORITY_TIME_CRITICAL):
+                return "TIME_CRITICAL"
+            return None
+        finally:
+            kernel32.CloseHandle(handle)
+
+    # Only on Linux is a native thread id also a schedulable PID; on macOS
+    # and the BSDs it would address an unrelated process
+    if not sys.platform.startswith('linux'):
+        return None
+
+    try:
+        os.sched_setscheduler(tid, os.SCHED_FIFO, os.sched_param(10))
+        return "SCHED_FIFO"
+    except (OSError, AttributeError):
+        pass
+
+    try:
+        # On Linux a TID addresses a single thread, so only it is re-niced
+        os.setpriority(os.PRIO_PROCESS, tid, -10)
+        return "nice -10"
+    except (OSError, AttributeError):
+        return None
+
 
 class VoiceActivityDetector:
-    """Real-time voice activity detector using microphone input."""
+    """
+    Real-time voice activity detector using microphone input.
+
+    The listen thread asks for real-time scheduling when it starts (see
+    _raise_thread_priority); grant CAP_SYS_NICE to the Python binary to
+    allow it on Linux. PortAudio's ALSA/OSS host latency floor can be
+    lowered with the PA_MIN_LATENCY_MSEC environment variable.
+    """
 
     def __init__(self,
                  sample_rate: int = 16000,
-                 frame_duration_ms: int = 30,
+                 frame_duration_ms: int = 20,
                  aggressiveness: int = 2,
                  speech_start_callback: Optional[Callable] = None,
                  speech_end_callback: Optional[Callable] = None,
-                 padding_duration_ms: int = 300):
+                 padding_duration_ms: int = 300,
+                 debug: bool = False):
         """
         Initialize Voice Activity Detector.
 
         Args:
-            sample_rate: Audio sample rate (8000, 16000, or 32000 Hz)
-            frame_duration_ms: Frame duration in ms (10, 20, or 30)
+            sample_rate: Audio sample rate (8000, 16000, 32000, or 48000 Hz)
+            frame_duration_ms: Frame duration in ms (10, 20, or 30; 20 gives the
+                best accuracy/latency trade-off for WebRTC VAD)
             aggressiveness: VAD aggressiveness (0-3, higher = more aggressive)
             speech_start_callback: Function to call when speech starts
             speech_end_callback: Function to call when speech ends
             padding_duration_ms: Duration of silence before triggering speech_end
+            debug: Log speech start/end transitions (printed from a separate thread)
         """
+        if sample_rate not in (8000, 16000, 32000, 48000):
+            raise ValueError(f"WebRTC VAD does not support sample_rate={sample_rate}")
+        if frame_duration_ms not in (10, 20, 30):
+            raise ValueError(f"frame_duration_ms must be 10, 20 or 30, got {frame_duration_ms}")
+
         self.sample_rate = sample_rate
         self.frame_duration_ms = frame_duration_ms
         self.aggressiveness = aggressiveness
@@ -43,27 +140,56 @@ class VoiceActivityDetector:
         self.frame_bytes = self.frame_size * 2  # 16-bit = 2 bytes per sample
 
         # Padding: Number of frames to keep before/after speech
-        self.padding_frames = int(padding_duration_ms / frame_duration_ms)
+        self.padding_frames = max(1, padding_duration_ms // frame_duration_ms)
+
+        # Trigger once more than 90% of the padding window is voiced (or
+        # unvoiced). count > 0.9 * n is the same test as count > floor(0.9 * n)
+        # for integer counts, so the thresholds are fixed ints.
+        self._trigger_count = int(0.9 * self.padding_frames)
+        self._silence_count = self._trigger_count
 
         # Initialize WebRTC VAD
         self.vad = webrtcvad.Vad(aggressiveness)
 
+        # Energy pre-gate: frames well below the adaptive noise floor are
+        # treated as silence without running the VAD classifier
+        self._energy_history = collections.deque(maxlen=max(1, 3000 // frame_duration_ms))
+        self._noise_floor = 0.0
+        self._gate_margin = 2.0
+        self._frames_since_floor_update = 0
+
         # Initialize PyAudio
         self.audio = pyaudio.PyAudio()
         self.stream = None
 
-        # State tracking
+        # Captured frames, filled by the PortAudio callback and drained by
+        # the listen loop so VAD work never delays capture
+        self.frames = queue.SimpleQueue()
+
+        # State tracking: speech flags for the last padding_frames frames in a
+        # fixed uint8 ring, plus a running count of the voiced ones so each
+        # frame is O(1)
         self.is_speaking = False
-        self.ring_buffer = collections.deque(maxlen=self.padding_frames)
+        self._ring = np.zeros(self.padding_frames, dtype=np.uint8)
+        self._ring_idx = 0
+        self._ring_filled = 0
+        self._voiced_count = 0
         self.triggered = False
 
         # Threading
         self.running = False
         self.thread = None
 
+        # Debug messages are printed by their own thread so stdout I/O never
+        # runs on the listen loop
+        self.debug = debug
+        self._log_q = queue.SimpleQueue()
+        self._log_thread = None
+
     def _audio_callback(self, in_data, frame_count, time_info, status):
-        """Callback for audio stream (not used in blocking mode)."""
-        return (in_data, pyaudio.paContinue)
+        """PortAudio callback: hand the frame to the VAD thread and return immediately."""
+        self.frames.put(in_data)
+        return (None, pyaudio.paContinue)
 
     def start(self):
         """Start listening for voice activity."""
@@ -78,60 +204,113 @@ class VoiceActivityDetector:
                 channels=1,
                 rate=self.sample_rate,
                 input=True,
+                # One VAD frame per callback: the callback only enqueues, so
+                # it needs no extra headroom and onset latency stays at one frame
                 frames_per_buffer=self.frame_size,
+                stream_callback=self._audio_callback,
             )
 
             self.running = True
+            if self.debug:
+                self._log_thread = threading.Thread(target=self._log_loop, daemon=True)
+                self._log_thread.start()
             self.thread = threading.Thread(target=self._listen_loop, daemon=True)
             self.thread.start()
+            policy = _raise_thread_priority(self.thread)
+            self._log(f"[VOICE] Listen thread priority: {policy or 'default (not permitted)'}")
             print(f"Voice detector started (sample_rate={self.sample_rate}Hz, aggressiveness={self.aggressiveness})")
 
         except Exception as e:
             print(f"Error starting voice detector: {e}")
             self.running = False
 
+    def _log(self, message: str):
+        """Queue a debug message for the log thread."""
+        if self.debug:
+            self._log_q.put_nowait(message)
+
+    def _log_loop(self):
+        """Print queued debug messages until a None sentinel arrives."""
+        while True:
+            message = self._log_q.get()
+            if message is None:
+                break
+            print(message)
+
+    def _update_noise_floor(self, energy: float):
+        """Track the noise floor as an EMA of the quietest 10% of the last ~3s of non-speech."""
+        self._energy_history.append(energy)
+        self._frames_since_floor_update += 1
+
+        history_full = len(self._energy_history) == self._energy_history.maxlen
+        if history_full and self._frames_since_floor_update >= 50:
+            self._frames_since_floor_update = 0
+            quiet = float(np.percentile(self._energy_history, 10))
+            self._noise_floor = quiet if not self._noise_floor else 0.7 * self._noise_floor + 0.3 * quiet
+
+    def _push_flag(self, is_speech: bool):
+        """Record one frame's VAD result, keeping the voiced count in step."""
+        self._ring_idx, self._ring_filled, self._voiced_count = _advance_ring(
+            self._ring, self._ring_idx, self._ring_filled, self._voiced_count, int(is_speech)
+        )
+
+    def _clear_flags(self):
+        # Slots past _ring_filled are never read, so the ring needn't be zeroed
+        self._ring_idx = 0
+        self._ring_filled = 0
+        self._voiced_count = 0
+
     def _listen_loop(self):
         """Main listening loop that processes audio frames."""
         print("Listening for voice activity...")
 
         while self.running:
             try:
-                # Read audio frame
-                frame = self.stream.read(self.frame_size, exception_on_overflow=False)
+                # Next captured frame (timeout so stop() is noticed)
+                try:
+                    frame = self.frames.get(timeout=0.1)
+                except queue.Empty:
+                    continue
 
                 # Check if frame contains speech
-                is_speech = self.vad.is_speech(frame, self.sample_rate)
+                samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+                energy = float(np.dot(samples, samples)) / len(samples)
+                # Only learn the floor outside speech segments, otherwise
+                # sustained speech drags it up towards speech level
+                if not self.triggered:
+                    self._update_noise_floor(energy)
+
+                if energy < self._noise_floor * self._gate_margin:
+                    is_speech = False
+                else:
+                    is_speech = self.vad.is_speech(frame, self.sample_rate)
+
+                self._push_flag(is_speech)
 
                 if not self.triggered:
                     # Not currently in speech segment
-                    self.ring_buffer.append((frame, is_speech))
-                    num_voiced = len([f for f, speech in self.ring_buffer if speech])
-
                     # If more than 90% of frames in buffer are speech, trigger
-                    if num_voiced > 0.9 * self.ring_buffer.maxlen:
+                    if self._voiced_count > self._trigger_count:
                         self.triggered = True
                         self.is_speaking = True
-                        print("[VOICE] Speech started")
+                        self._log("[VOICE] Speech started")
                         if self.speech_start_callback:
                             self.speech_start_callback()
-                        self.ring_buffer.clear()
+                        self._clear_flags()
                 else:
                     # Currently in speech segment
-                    self.ring_buffer.append((frame, is_speech))
-                    num_unvoiced = len([f for f, speech in self.ring_buffer if not speech])
-
                     # If more than 90% of frames in buffer are silence, end speech
-                    if num_unvoiced > 0.9 * self.ring_buffer.maxlen:
+                    if self._ring_filled - self._voiced_count > self._silence_count:
                         self.triggered = False
                         self.is_speaking = False
-                        print("[VOICE] Speech ended")
+                        self._log("[VOICE] Speech ended")
                         if self.speech_end_callback:
                             self.speech_end_callback()
-                        self.ring_buffer.clear()
+                        self._clear_flags()
 
             except Exception as e:
-                print(f"Error in voice detection loop: {e}")
                 time.sleep(0.1)
+                print(f"Error in voice detection loop: {e}")
 
     def stop(self):
         """Stop listening for voice activity."""
@@ -144,6 +323,11 @@ class VoiceActivityDetector:
         if self.thread:
             self.thread.join(timeout=2.0)
 
+        if self._log_thread:
+            self._log_q.put_nowait(None)
+            self._log_thread.join(timeout=1.0)
+            self._log_thread = None
+
         if self.stream:
             self.stream.stop_stream()
             self.stream.close()
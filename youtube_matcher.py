@@ -3,28 +3,52 @@ YouTube video matcher for Spotify podcasts.
 Searches YouTube for matching videos and fetches transcripts.
 """
 
-from typing import Optional, Dict, Any, List
-from fuzzywuzzy import fuzz
+from typing import Optional, Dict, Any, List, Tuple
+import asyncio
+import httpx
+import numpy as np
+from rapidfuzz import fuzz, process, utils
 from youtube_transcript_api import YouTubeTranscriptApi
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from diskcache import Cache
 import json
+import re
 from pathlib import Path
 
+_ISO8601_DURATION = re.compile(r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?')
+
 
 class YouTubeMatcher:
     """Matches Spotify podcast episodes to YouTube videos and fetches transcripts."""
 
-    def __init__(self, api_key: Optional[str] = None):
+    # Search results and transcripts are reused for 30 days
+    CACHE_EXPIRE_SECONDS = 30 * 24 * 3600
+
+    # YouTube Data API v3 REST endpoint, used by the concurrent batch matcher
+    API_BASE_URL = "https://www.googleapis.com/youtube/v3"
+
+    def __init__(self, api_key: Optional[str] = None, cache_dir: Optional[Path] = None):
         """
         Initialize YouTube matcher.
 
         Args:
             api_key: YouTube Data API key (optional, can work without for transcripts)
+            cache_dir: Directory for cached search results and transcripts
         """
         self.api_key = api_key
         self.youtube = None
 
+        # One transcript client for every fetch, so its HTTP session is reused
+        self._transcript_api = YouTubeTranscriptApi()
+
+        # Repeat lookups for the same episode skip the network and API quota
+        self._cache = Cache(str(cache_dir or Path(__file__).parent / ".youtube_cache"))
+
+        # Timestamp index of the most recently searched transcript
+        self._indexed_transcript = None
+        self._transcript_index = None
+
         if api_key:
             try:
                 self.youtube = build('youtube', 'v3', developerKey=api_key)
@@ -43,6 +67,11 @@ class YouTubeMatcher:
         Returns:
             List of video information dictionaries
         """
+        cache_key = ("search", query, max_results)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         if not self.youtube:
             print("YouTube API not available. Cannot search.")
             return []
@@ -55,33 +84,119 @@ class YouTubeMatcher:
                 type='video'
             ).execute()
 
-            videos = []
-            for item in search_response.get('items', []):
-                if item['id']['kind'] == 'youtube#video':
-                    video_id = item['id']['videoId']
-
-                    # Get video details including duration
-                    video_response = self.youtube.videos().list(
-                        part='contentDetails,snippet',
-                        id=video_id
-                    ).execute()
-
-                    if video_response['items']:
-                        video_data = video_response['items'][0]
-                        videos.append({
-                            'video_id': video_id,
-                            'title': video_data['snippet']['title'],
-                            'channel': video_data['snippet']['channelTitle'],
-                            'duration_iso': video_data['contentDetails']['duration'],
-                            'duration_seconds': self._parse_duration(video_data['contentDetails']['duration'])
-                        })
+            video_ids = [
+                item['id']['videoId']
+                for item in search_response.get('items', [])
+                if item['id']['kind'] == 'youtube#video'
+            ]
+
+            if not video_ids:
+                return []
+
+            # Get details including duration for all results in one request.
+            # Snippet is fetched here too: search snippets have HTML-escaped titles.
+            video_response = self.youtube.videos().list(
+                part='contentDetails,snippet',
+                id=','.join(video_ids),
+                maxResults=len(video_ids)
+            ).execute()
+
+            videos = self._videos_from_details(video_ids, video_response.get('items', []))
 
+            if videos:
+                self._cache.set(cache_key, videos, expire=self.CACHE_EXPIRE_SECONDS)
             return videos
 
         except HttpError as e:
             print(f"YouTube API error: {e}")
             return []
 
+    async def _asearch_youtube(self, client: httpx.AsyncClient, query: str,
+                               max_results: int = 5) -> List[Dict[str, Any]]:
+        """
+        Async search_youtube() against the REST API, sharing the same cache.
+
+        Args:
+            client: HTTP client to issue the requests with
+            query: Search query
+            max_results: Maximum number of results to return
+
+        Returns:
+            List of video information dictionaries
+        """
+        cache_key = ("search", query, max_results)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        if not self.api_key:
+            print("YouTube API not available. Cannot search.")
+            return []
+
+        try:
+            search_response = await client.get(f"{self.API_BASE_URL}/search", params={
+                'q': query,
+                'part': 'id,snippet',
+                'maxResults': max_results,
+                'type': 'video',
+                'key': self.api_key,
+            })
+            search_response.raise_for_status()
+
+            video_ids = [
+                item['id']['videoId']
+                for item in search_response.json().get('items', [])
+                if item['id']['kind'] == 'youtube#video'
+            ]
+
+            if not video_ids:
+                return []
+
+            video_response = await client.get(f"{self.API_BASE_URL}/videos", params={
+                'part': 'contentDetails,snippet',
+                'id': ','.join(video_ids),
+                'maxResults': len(video_ids),
+                'key': self.api_key,
+            })
+            video_response.raise_for_status()
+
+            videos = self._videos_from_details(video_ids, video_response.json().get('items', []))
+
+            if videos:
+                self._cache.set(cache_key, videos, expire=self.CACHE_EXPIRE_SECONDS)
+            return videos
+
+        except httpx.HTTPError as e:
+            print(f"YouTube API error: {e}")
+            return []
+
+    def _videos_from_details(self, video_ids: List[str],
+                             items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Build video info dicts from a videos.list response, in search ranking order.
+
+        Args:
+            video_ids: Video IDs in the order the search returned them
+            items: 'items' of the videos.list response
+
+        Returns:
+            List of video information dictionaries
+        """
+        details = {item['id']: item for item in items}
+
+        videos = []
+        for video_id in video_ids:
+            video_data = details.get(video_id)
+            if video_data:
+                videos.append({
+                    'video_id': video_id,
+                    'title': video_data['snippet']['title'],
+                    'channel': video_data['snippet']['channelTitle'],
+                    'duration_iso': video_data['contentDetails']['duration'],
+                    'duration_seconds': self._parse_duration(video_data['contentDetails']['duration'])
+                })
+        return videos
+
     def _parse_duration(self, iso_duration: str) -> int:
         """
         Parse ISO 8601 duration to seconds.
@@ -92,10 +207,7 @@ class YouTubeMatcher:
         Returns:
             Duration in seconds
         """
-        import re
-
-        pattern = re.compile(r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?')
-        match = pattern.match(iso_duration)
+        match = _ISO8601_DURATION.match(iso_duration)
 
         if not match:
             return 0
@@ -116,74 +228,120 @@ class YouTubeMatcher:
         Returns:
             Best matching video info or None
         """
-        episode_title = episode_info.get('title', '')
-        show_name = episode_info.get('show', '')
-        episode_duration_seconds = episode_info.get('duration_ms', 0) / 1000
+        query = self._episode_query(episode_info)
+        print(f"Searching YouTube for: {query[:80]}...")
 
-        # Build search query
-        query = f"{show_name} {episode_title}"
+        return self._pick_best_match(episode_info, self.search_youtube(query, max_results=10))
 
+    def match_episodes_to_youtube(self, episodes: List[Dict[str, Any]],
+                                  with_transcripts: bool = False) -> List[Optional[Dict[str, Any]]]:
+        """
+        Match several Spotify episodes at once, overlapping their network requests.
+
+        Searches run concurrently over one HTTP client; transcript fetches
+        (if requested) run on the default thread pool since
+        YouTubeTranscriptApi is synchronous. Must not be called from a
+        running event loop.
+
+        Args:
+            episodes: Episode info dictionaries, as for match_episode_to_youtube()
+            with_transcripts: Also fetch each match's transcript into match['transcript']
+
+        Returns:
+            Best matching video info (or None) for each episode, in order
+        """
+        return asyncio.run(self._amatch_all(episodes, with_transcripts))
+
+    async def _amatch_all(self, episodes: List[Dict[str, Any]],
+                          with_transcripts: bool) -> List[Optional[Dict[str, Any]]]:
+        """Run _amatch() for every episode on a shared HTTP client."""
+        async with httpx.AsyncClient(timeout=15.0) as client:
+            return list(await asyncio.gather(
+                *[self._amatch(client, episode, with_transcripts) for episode in episodes]
+            ))
+
+    async def _amatch(self, client: httpx.AsyncClient, episode_info: Dict[str, Any],
+                      with_transcript: bool) -> Optional[Dict[str, Any]]:
+        """Async match_episode_to_youtube(), optionally fetching the transcript too."""
+        query = self._episode_query(episode_info)
         print(f"Searching YouTube for: {query[:80]}...")
 
-        # Search YouTube
-        videos = self.search_youtube(query, max_results=10)
+        videos = await self._asearch_youtube(client, query, max_results=10)
+        match = self._pick_best_match(episode_info, videos)
+
+        if match and with_transcript:
+            loop = asyncio.get_running_loop()
+            match['transcript'] = await loop.run_in_executor(None, self.get_transcript, match['video_id'])
+
+        return match
+
+    def _episode_query(self, episode_info: Dict[str, Any]) -> str:
+        """Build the YouTube search query for an episode."""
+        return f"{episode_info.get('show', '')} {episode_info.get('title', '')}"
+
+    def _pick_best_match(self, episode_info: Dict[str, Any],
+                         videos: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Score search results against an episode and return the best one.
+
+        Args:
+            episode_info: Dictionary with 'title', 'show', 'duration_ms'
+            videos: Search results from search_youtube()
+
+        Returns:
+            Best matching video info (with 'match_score') or None
+        """
+        episode_title = episode_info.get('title', '')
+        show_name = episode_info.get('show', '')
+        episode_duration_seconds = episode_info.get('duration_ms', 0) / 1000
 
         if not videos:
             print("No YouTube results found")
             return None
 
-        # Score each video
-        best_match = None
-        best_score = 0
-        all_scores = []
-
-        for video in videos:
-            score = 0
-
-            # Title similarity (0-50 points)
-            title_similarity = fuzz.token_sort_ratio(
-                episode_title.lower(),
-                video['title'].lower()
-            ) / 100
-            score += title_similarity * 50
-
-            # Channel/Show name match (0-30 points)
-            channel_similarity = fuzz.partial_ratio(
-                show_name.lower(),
-                video['channel'].lower()
-            ) / 100
-            score += channel_similarity * 30
-
-            # Duration match (0-20 points)
-            if episode_duration_seconds > 0 and video['duration_seconds'] > 0:
-                duration_diff = abs(video['duration_seconds'] - episode_duration_seconds)
-                # Within 2 minutes = full points, linearly decrease
-                duration_score = max(0, 1 - (duration_diff / 120))
-                score += duration_score * 20
-
-            # Store score for debug output
-            all_scores.append({
-                'title': video['title'],
-                'channel': video['channel'],
-                'score': score,
-                'title_sim': title_similarity * 50,
-                'channel_sim': channel_similarity * 30,
-                'duration': video['duration_seconds']
-            })
+        # Score all titles and channels in one call each
+        title_sims = process.cdist(
+            [episode_title], [video['title'] for video in videos],
+            scorer=fuzz.token_sort_ratio, processor=utils.default_process
+        )[0] / 100
+        channel_sims = process.cdist(
+            [show_name.lower()], [video['channel'].lower() for video in videos],
+            scorer=fuzz.partial_ratio
+        )[0] / 100
+
+        # Duration match: within 2 minutes = full points, linearly decrease.
+        # Videos (or episodes) without a known duration score zero here.
+        durations = np.array([video['duration_seconds'] for video in videos], dtype=float)
+        if episode_duration_seconds > 0:
+            duration_scores = np.where(
+                durations > 0,
+                np.clip(1 - np.abs(durations - episode_duration_seconds) / 120, 0, 1),
+                0
+            )
+        else:
+            duration_scores = np.zeros(len(videos))
 
-            # Update best match
-            if score > best_score:
-                best_score = score
-                best_match = video
-                best_match['match_score'] = score
+        # Title 0-50, channel 0-30, duration 0-20 points
+        title_points = 50 * title_sims
+        channel_points = 30 * channel_sims
+        scores = title_points + channel_points + 20 * duration_scores
+
+        best_idx = int(scores.argmax())
+        best_score = float(scores[best_idx])
+        best_match = None
+        if best_score > 0:
+            best_match = videos[best_idx]
+            best_match['match_score'] = best_score
 
-        # Show all candidates sorted by score
+        # Show the top candidates: partial selection, then order just those
+        top = np.argpartition(-scores, min(5, len(scores) - 1))[:5]
+        top = top[np.argsort(-scores[top], kind='stable')]
         print("\n🔍 All candidates (sorted by match score):")
-        all_scores.sort(key=lambda x: x['score'], reverse=True)
-        for i, candidate in enumerate(all_scores[:5], 1):
-            print(f"   {i}. [{candidate['score']:.1f}] {candidate['title'][:50]}")
-            print(f"      Channel: {candidate['channel'][:40]} | Duration: {candidate['duration']:.0f}s")
-            print(f"      (title: {candidate['title_sim']:.1f}, channel: {candidate['channel_sim']:.1f})")
+        for rank, i in enumerate(top, 1):
+            video = videos[i]
+            print(f"   {rank}. [{scores[i]:.1f}] {video['title'][:50]}")
+            print(f"      Channel: {video['channel'][:40]} | Duration: {video['duration_seconds']:.0f}s")
+            print(f"      (title: {title_points[i]:.1f}, channel: {channel_points[i]:.1f})")
         print()
 
         # Show what we found regardless of confidence
@@ -211,28 +369,49 @@ class YouTubeMatcher:
         Returns:
             List of transcript segments with 'start', 'duration', 'text'
         """
+        cache_key = ("transcript", video_id)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            print(f"✓ Loaded cached transcript for video {video_id}")
+            return cached
+
         try:
             print(f"Fetching transcript for video {video_id}...")
-            # Create instance and fetch transcript
-            api = YouTubeTranscriptApi()
-            fetched_transcript = api.fetch(video_id)
+            fetched_transcript = self._transcript_api.fetch(video_id)
             # Convert each snippet to plain dict
-            transcript = []
-            for snippet in fetched_transcript:
-                transcript.append({
-                    'text': snippet.text,
-                    'start': snippet.start,
-                    'duration': snippet.duration
-                })
+            transcript = [
+                {'text': snippet.text.strip(), 'start': snippet.start, 'duration': snippet.duration}
+                for snippet in fetched_transcript
+            ]
             print(f"✓ Got transcript with {len(transcript)} segments")
+            if transcript:
+                self._cache.set(cache_key, transcript, expire=self.CACHE_EXPIRE_SECONDS)
             return transcript
         except Exception as e:
             print(f"✗ Could not fetch transcript: {e}")
             return None
 
+    @staticmethod
+    def build_timestamp_index(transcript: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray, float]:
+        """
+        Precompute segment times as arrays for fast timestamp lookups.
+
+        Args:
+            transcript: List of transcript segments, in time order
+
+        Returns:
+            (start times, end times, longest segment duration)
+        """
+        starts = np.fromiter((seg['start'] for seg in transcript), dtype=np.float64, count=len(transcript))
+        durations = np.fromiter((seg['duration'] for seg in transcript), dtype=np.float64, count=len(transcript))
+        max_duration = float(durations.max()) if len(durations) else 0.0
+        return starts, starts + durations, max_duration
+
     def find_transcript_at_timestamp(self, transcript: List[Dict[str, Any]],
                                     timestamp_seconds: float,
-                                    context_seconds: int = 30) -> Optional[str]:
+                                    context_seconds: int = 30,
+                                    index: Optional[Tuple[np.ndarray, np.ndarray, float]] = None,
+                                    verbose: bool = False) -> Optional[str]:
         """
         Find transcript text at a specific timestamp with context.
 
@@ -240,6 +419,9 @@ class YouTubeMatcher:
             transcript: List of transcript segments
             timestamp_seconds: Timestamp to look up
             context_seconds: How many seconds of context before/after
+            index: Result of build_timestamp_index() for this transcript
+                (built and cached automatically if omitted)
+            verbose: Print the lookup range and matched segments
 
         Returns:
             Transcript text around the timestamp
@@ -251,34 +433,43 @@ class YouTubeMatcher:
         start_time = max(0, timestamp_seconds - context_seconds)
         end_time = timestamp_seconds + context_seconds
 
-        mins = int(timestamp_seconds // 60)
-        secs = int(timestamp_seconds % 60)
-        print(f"\n🔍 Looking for transcript at {mins}:{secs:02d} (±{context_seconds}s range)")
-        print(f"   Time range: {start_time:.1f}s - {end_time:.1f}s")
+        if verbose:
+            mins = int(timestamp_seconds // 60)
+            secs = int(timestamp_seconds % 60)
+            print(f"\n🔍 Looking for transcript at {mins}:{secs:02d} (±{context_seconds}s range)")
+            print(f"   Time range: {start_time:.1f}s - {end_time:.1f}s")
+
+        # Only scan segments that can possibly overlap. The index is built
+        # once per transcript when the caller doesn't supply one.
+        if index is None:
+            if transcript is not self._indexed_transcript:
+                self._transcript_index = self.build_timestamp_index(transcript)
+                self._indexed_transcript = transcript
+            index = self._transcript_index
 
-        relevant_segments = []
-        for segment in transcript:
-            seg_start = segment['start']
-            seg_end = seg_start + segment['duration']
+        starts, ends, max_duration = index
+        lo = int(np.searchsorted(starts, start_time - max_duration, side='left'))
+        hi = int(np.searchsorted(starts, end_time, side='right'))
 
-            # Check if segment overlaps with our time range
-            if seg_start <= end_time and seg_end >= start_time:
-                relevant_segments.append(segment)
+        # Every candidate starts by end_time; keep those that end after start_time
+        overlapping = lo + np.flatnonzero(ends[lo:hi] >= start_time)
+        relevant_segments = [transcript[i] for i in overlapping]
 
         if not relevant_segments:
-            print(f"   ⚠ No transcript segments found in this time range!")
-            print(f"   First segment starts at: {transcript[0]['start']:.1f}s" if transcript else "   (empty transcript)")
-            print(f"   Last segment ends at: {transcript[-1]['start'] + transcript[-1]['duration']:.1f}s" if transcript else "")
+            if verbose:
+                print(f"   ⚠ No transcript segments found in this time range!")
+                print(f"   First segment starts at: {transcript[0]['start']:.1f}s")
+                print(f"   Last segment ends at: {transcript[-1]['start'] + transcript[-1]['duration']:.1f}s")
             return None
 
-        print(f"   ✓ Found {len(relevant_segments)} segments")
-        first_seg_time = relevant_segments[0]['start']
-        last_seg_time = relevant_segments[-1]['start'] + relevant_segments[-1]['duration']
-        print(f"   Segment range: {first_seg_time:.1f}s - {last_seg_time:.1f}s")
+        if verbose:
+            print(f"   ✓ Found {len(relevant_segments)} segments")
+            first_seg_time = relevant_segments[0]['start']
+            last_seg_time = relevant_segments[-1]['start'] + relevant_segments[-1]['duration']
+            print(f"   Segment range: {first_seg_time:.1f}s - {last_seg_time:.1f}s")
 
         # Combine text from relevant segments
-        text = ' '.join(seg['text'] for seg in relevant_segments)
-        return text.strip()
+        return ' '.join([seg['text'] for seg in relevant_segments])
 
 
 # Standalone function for easy testing
@@ -307,7 +498,7 @@ def test_matcher():
 
         if transcript:
             # Test timestamp lookup
-            text = matcher.find_transcript_at_timestamp(transcript, 60)  # 1 minute in
+            text = matcher.find_transcript_at_timestamp(transcript, 60, verbose=True)  # 1 minute in
             print(f"\nText at 1:00: {text[:200]}...")
     else:
         print("No match found")